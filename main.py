@@ -28,6 +28,8 @@ def main():
                        help='Train genre classification model with data file')
     parser.add_argument('--config', type=str, default='.env',
                        help='Path to configuration file')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Ignore the audio feature and research lookup caches')
     
     args = parser.parse_args()
     
@@ -39,6 +41,10 @@ def main():
     if not validate_config(config):
         sys.exit(1)
     
+    if args.no_cache:
+        config['FEATURE_CACHE_DIR'] = None
+        config['RESEARCH_CACHE_DIR'] = None
+    
     # Setup logging
     setup_logging(config['LOG_LEVEL'])
     
@@ -61,6 +61,12 @@ setup(
             "pytest-cov>=4.0",
             "pytest-mock>=3.0",
         ],
+        "async": [
+            "httpx[http2]>=0.25.0",
+        ],
+        "fftw": [
+            "pyFFTW>=0.13.1",
+        ],
     },
     entry_points={
         "console_scripts": [
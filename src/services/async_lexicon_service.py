@@ -0,0 +1,78 @@
+import asyncio
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+from .lexicon_service import LexiconService
+
+try:
+    import httpx
+except ImportError:  # optional dependency, see the "async" extra
+    httpx = None
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncLexiconService(LexiconService):
+    """LexiconService that sends its per-item writes concurrently with httpx
+    
+    Reads and single calls behave exactly like ``LexiconService``. Writes that
+    fall back to one request per track (genre updates, playlist additions)
+    are sent with ``asyncio.gather`` over a single ``httpx.AsyncClient``. The
+    client multiplexes them over HTTP/2 when ``h2`` is installed. Callers stay
+    synchronous.
+    """
+    
+    def __init__(self, base_url: str = "http://localhost:48624", api_version: str = "v1",
+                 timeout: Tuple[float, float] = (3, 30), max_concurrency: int = 32):
+        if httpx is None:
+            raise ImportError("AsyncLexiconService requires httpx: pip install 'genrebend-pro[async]'")
+        
+        super().__init__(base_url=base_url, api_version=api_version, timeout=timeout)
+        self.max_concurrency = max_concurrency
+    
+    def _send_each(self, calls: List[Tuple[str, str, Dict[str, Any]]]) -> List[bool]:
+        """Send ``(method, endpoint, json)`` requests concurrently on an event loop"""
+        if not calls:
+            return []
+        
+        results = asyncio.run(self._gather_requests(calls))
+        return [result is not None for result in results]
+    
+    async def _gather_requests(self, calls: List[Tuple[str, str, Dict[str, Any]]]) -> List[Optional[Dict[str, Any]]]:
+        """Run the requests with at most ``max_concurrency`` in flight"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async with httpx.AsyncClient(
+            base_url=f"{self.base_url}/{self.api_version}/",
+            headers={'Content-Type': 'application/json', 'Accept': 'application/json'},
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=64),
+            timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0])
+        ) as client:
+            # One failed request must not take the rest of the batch with it
+            results = await asyncio.gather(*(
+                self._request_async(client, semaphore, method, endpoint, json=body)
+                for method, endpoint, body in calls
+            ), return_exceptions=True)
+        
+        for (method, endpoint, _), result in zip(calls, results):
+            if isinstance(result, Exception):
+                logger.error(f"API request {method} {endpoint} failed: {result}")
+        return [None if isinstance(result, Exception) else result for result in results]
+    
+    async def _request_async(self, client: "httpx.AsyncClient", semaphore: asyncio.Semaphore,
+                             method: str, endpoint: str, **kwargs) -> Optional[Dict[str, Any]]:
+        """Make a request to the Lexicon API on the shared async client"""
+        async with semaphore:
+            try:
+                response = await client.request(method, endpoint, **kwargs)
+                response.raise_for_status()
+                return response.json() if response.content else {}
+            except (httpx.HTTPError, ValueError) as e:
+                logger.error(f"API request failed: {e}")
+                return None
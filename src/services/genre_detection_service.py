@@ -1,28 +1,333 @@
 import librosa
 import numpy as np
 import pandas as pd
-from sklearn.ensemble import RandomForestClassifier
+import scipy.fft
+import soundfile as sf
+from scipy.signal import resample_poly
+from sklearn.ensemble import HistGradientBoostingClassifier
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
+import hashlib
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+import logging.handlers
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from itertools import chain
+from typing import List, Dict, Any, Iterable, Optional, Sequence, Set, Sized, Tuple
 import os
-import pickle
+import unicodedata
+import joblib
+from threadpoolctl import threadpool_limits
 from ..models.track_models import TrackInfo, GenreAnalysis, Genre, MusicResearchResult
 
+try:
+    import pyfftw
+except ImportError:  # optional dependency, see the "fftw" extra
+    pyfftw = None
+
 logger = logging.getLogger(__name__)
 
 
+def _use_fftw_backend():
+    """Route librosa's FFTs through FFTW when pyFFTW is installed"""
+    pyfftw.interfaces.cache.enable()
+    # Batches already parallelize across processes, so keep plans single-threaded
+    pyfftw.config.NUM_THREADS = 1
+    
+    if librosa.get_fftlib() is scipy.fft:
+        scipy.fft.set_global_backend(pyfftw.interfaces.scipy_fft)
+    else:
+        # librosa < 0.11 calls its own FFT library directly instead of scipy.fft
+        librosa.set_fftlib(pyfftw.interfaces.numpy_fft)
+
+
+if pyfftw is not None:
+    _use_fftw_backend()
+
+# Map genres to common playlist names. Tuples, so every analysis can share them.
+_PLAYLIST_SUGGESTIONS = {
+    Genre.HOUSE: ("House Music", "Deep House", "House Classics"),
+    Genre.DEEP_HOUSE: ("Deep House", "House Music", "Chill House"),
+    Genre.TECHNO: ("Techno", "Dark Techno", "Industrial Techno"),
+    Genre.TRANCE: ("Trance", "Progressive Trance", "Uplifting Trance"),
+    Genre.DUBSTEP: ("Dubstep", "Bass Music", "Electronic"),
+    Genre.DRUM_AND_BASS: ("Drum & Bass", "DnB", "Liquid DnB"),
+    Genre.BREAKBEAT: ("Breakbeat", "Big Beat", "Breaks"),
+    Genre.AMBIENT: ("Ambient", "Chillout", "Relaxing"),
+    Genre.DOWNTEMPO: ("Downtempo", "Chill", "Lounge"),
+    Genre.PROGRESSIVE: ("Progressive", "Progressive House", "Progressive Trance"),
+    Genre.FUTURE_BASS: ("Future Bass", "Bass Music", "Electronic"),
+    Genre.TRAP: ("Trap", "Hip Hop", "Bass Music"),
+    Genre.ELECTRONIC: ("Electronic", "EDM", "Electronic Music"),
+    Genre.EXPERIMENTAL: ("Experimental", "Avant-garde", "Abstract")
+}
+_DEFAULT_PLAYLIST_SUGGESTIONS = ("Electronic", "Music")
+
+# Column order of the model's feature vector, matching what
+# _features_from_audio produces with compute_hpss
+AUDIO_FEATURE_ORDER: Tuple[str, ...] = (
+    'spectral_centroid', 'spectral_rolloff', 'spectral_bandwidth', 'zero_crossing_rate',
+    *(f'mfcc_{i}' for i in range(13)),
+    *(f'chroma_{i}' for i in range(12)),
+    'tempo', 'beat_strength',
+    *(f'tonnetz_{i}' for i in range(6)),
+    'harmonic_ratio',
+)
+
+# Without compute_hpss the last column is the spectral_tonality estimate instead
+TONALITY_FEATURE_ORDER: Tuple[str, ...] = AUDIO_FEATURE_ORDER[:-1] + ('spectral_tonality',)
+
+# Part of every feature cache key; bump it when extracted features change meaning
+FEATURE_CACHE_VERSION = 2
+
+
+def _init_audio_worker(log_queue=None, log_level: int = logging.WARNING):
+    """Pin native math libraries to one thread per worker process
+    
+    Log records are sent back over ``log_queue`` so worker errors reach the
+    same handlers (and log file) as the rest of the run.
+    """
+    # Each worker already owns a core; letting BLAS/OpenMP spawn their own
+    # thread pools on top of that oversubscribes the machine. The libraries
+    # are loaded by the time this runs, so their environment variables would
+    # be ignored; threadpoolctl resizes the live pools instead.
+    threadpool_limits(limits=1)
+    
+    if log_queue is not None:
+        logging.basicConfig(level=log_level, handlers=[logging.handlers.QueueHandler(log_queue)],
+                            force=True)
+
+
+class _WorkerLogForwarder(logging.Handler):
+    """Hand records from audio workers to this process's loggers"""
+    
+    def emit(self, record: logging.LogRecord):
+        logging.getLogger(record.name).handle(record)
+
+
+def _spelling_key(name: str) -> str:
+    """Fold the differences a filesystem may ignore in a name: case and Unicode normalization"""
+    return unicodedata.normalize('NFC', name).casefold()
+
+
+def existing_files(file_paths: Iterable[str]) -> Set[str]:
+    """Return the subset of ``file_paths`` that exist as files
+    
+    Each parent directory is listed once with ``os.scandir`` rather than
+    stat-ing every path, which matters on network mounts where each stat is
+    a round trip. Paths are returned as given.
+    """
+    paths_by_dir = {}
+    for file_path in file_paths:
+        directory, name = os.path.split(os.path.normpath(file_path))
+        paths_by_dir.setdefault(directory, {}).setdefault(name, []).append(file_path)
+    
+    found = set()
+    to_stat = []
+    for directory, paths_by_name in paths_by_dir.items():
+        try:
+            listed_names = []
+            with os.scandir(directory or '.') as entries:
+                for entry in entries:
+                    listed_names.append(entry.name)
+                    if entry.name in paths_by_name and entry.is_file():
+                        found.update(paths_by_name.pop(entry.name))
+        except OSError:
+            # Unlistable directory; every path in it is checked on its own below
+            to_stat.extend(chain.from_iterable(paths_by_name.values()))
+            continue
+        
+        # A name the listing spells differently (case-insensitive filesystems
+        # such as macOS, NFC vs NFD) may still be the same file; names with
+        # no such entry are missing
+        if not paths_by_name:
+            continue
+        listed = {_spelling_key(name) for name in listed_names}
+        for name, paths in paths_by_name.items():
+            if _spelling_key(name) in listed:
+                to_stat.extend(paths)
+    
+    found.update(file_path for file_path in to_stat if os.path.isfile(file_path))
+    
+    return found
+
+
+def _load_audio(file_path: str, sample_rate: int, duration_limit: int) -> Tuple[np.ndarray, int]:
+    """Decode up to ``duration_limit`` seconds of mono audio at ``sample_rate``"""
+    try:
+        with sf.SoundFile(file_path) as audio_file:
+            native_sr = audio_file.samplerate
+            y = audio_file.read(frames=int(native_sr * duration_limit),
+                                dtype='float32', always_2d=False)
+    except RuntimeError:
+        # Formats libsndfile can't decode go through librosa's audioread fallback
+        y, sr = librosa.load(file_path, sr=sample_rate, duration=duration_limit, dtype=np.float32)
+        return y, sr
+    
+    if y.ndim > 1:
+        y = y.mean(axis=1)
+    
+    if native_sr != sample_rate:
+        y = resample_poly(y, up=sample_rate, down=native_sr)
+    
+    return y.astype(np.float32, copy=False), sample_rate
+
+
+def _feature_cache_path(cache_dir: str, file_path: str, settings: Tuple) -> str:
+    """Build the cache file path for a file's features under the given extraction settings"""
+    stat = os.stat(file_path)
+    key = hashlib.blake2b(
+        f"{file_path}:{stat.st_mtime_ns}:{stat.st_size}:{':'.join(map(str, settings))}".encode()
+    ).hexdigest()
+    return os.path.join(cache_dir, f"{key}.npz")
+
+
+def _load_cached_features(cache_dir: str, file_path: str, settings: Tuple) -> Optional[Dict[str, Any]]:
+    """Return cached features for a file, or None on a cache miss"""
+    try:
+        with np.load(_feature_cache_path(cache_dir, file_path, settings)) as cached:
+            return {name: cached[name][()] for name in cached.files}
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.debug(f"Feature cache lookup failed for {file_path}: {e}")
+    
+    return None
+
+
+def _store_cached_features(cache_dir: str, file_path: str, settings: Tuple, features: Dict[str, Any]):
+    """Write a file's extracted features to the cache"""
+    if not features:
+        return
+    
+    try:
+        cache_path = _feature_cache_path(cache_dir, file_path, settings)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, **features)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        logger.debug(f"Failed to cache features for {file_path}: {e}")
+
+
+def extract_audio_features(file_path: str, sample_rate: int = 22050,
+                           duration_limit: int = 30,
+                           cache_dir: Optional[str] = None,
+                           compute_hpss: bool = False,
+                           known_bpm: Optional[float] = None) -> Dict[str, Any]:
+    """Extract audio features from a music file, reusing cached results when possible"""
+    settings = (FEATURE_CACHE_VERSION, sample_rate, duration_limit, compute_hpss, known_bpm)
+    
+    if cache_dir:
+        cached = _load_cached_features(cache_dir, file_path, settings)
+        if cached is not None:
+            return cached
+    
+    features = _compute_audio_features(file_path, sample_rate, duration_limit,
+                                       compute_hpss, known_bpm)
+    
+    if cache_dir:
+        _store_cached_features(cache_dir, file_path, settings, features)
+    
+    return features
+
+
+def _compute_audio_features(file_path: str, sample_rate: int, duration_limit: int,
+                            compute_hpss: bool = False,
+                            known_bpm: Optional[float] = None) -> Dict[str, Any]:
+    """Extract audio features from a music file"""
+    try:
+        y, sr = _load_audio(file_path, sample_rate, duration_limit)
+        return _features_from_audio(y, sr, compute_hpss, known_bpm)
+    except Exception as e:
+        logger.error(f"Failed to extract audio features from {file_path}: {e}")
+        return {}
+
+
+def _features_from_audio(y: np.ndarray, sr: int, compute_hpss: bool = False,
+                         known_bpm: Optional[float] = None) -> Dict[str, Any]:
+    """Extract audio features from decoded mono audio
+    
+    ``harmonic_ratio`` needs a full harmonic/percussive separation and is
+    only computed when ``compute_hpss`` is set. Otherwise ``spectral_tonality``
+    (one minus the spectral flatness; tonal audio is far from flat) takes its
+    place, which reuses the STFT magnitude and skips the two median-filtered
+    spectrograms. The two are different features and aren't interchangeable
+    in a trained model.
+    
+    When ``known_bpm`` is given (e.g. from the track's metadata) it is used as
+    the tempo instead of estimating one from the audio.
+    """
+    # Compute the STFT once and derive every spectral representation
+    # from it instead of letting each librosa feature redo the FFTs
+    stft = librosa.stft(y, n_fft=2048, hop_length=512, dtype=np.complex64)
+    S = np.abs(stft)
+    S_power = S ** 2
+    mel_db = librosa.power_to_db(librosa.feature.melspectrogram(S=S_power, sr=sr))
+    
+    # Extract various audio features
+    features = {}
+    
+    # Spectral features
+    features['spectral_centroid'] = np.mean(librosa.feature.spectral_centroid(S=S, sr=sr))
+    features['spectral_rolloff'] = np.mean(librosa.feature.spectral_rolloff(S=S, sr=sr))
+    features['spectral_bandwidth'] = np.mean(librosa.feature.spectral_bandwidth(S=S, sr=sr))
+    features['zero_crossing_rate'] = np.mean(librosa.feature.zero_crossing_rate(y))
+    
+    # MFCC features
+    mfccs = librosa.feature.mfcc(S=mel_db, n_mfcc=13)
+    features.update({f'mfcc_{i}': value for i, value in enumerate(mfccs.mean(axis=1))})
+    
+    # Chroma features
+    chroma = librosa.feature.chroma_stft(S=S_power, sr=sr)
+    features.update({f'chroma_{i}': value for i, value in enumerate(chroma.mean(axis=1))})
+    
+    # Rhythm features; tempo estimation only needs the onset autocorrelation,
+    # not beat_track's dynamic-programming beat positions
+    if known_bpm:
+        features['tempo'] = float(known_bpm)
+    else:
+        onset_envelope = librosa.onset.onset_strength(S=mel_db, sr=sr)
+        features['tempo'] = librosa.feature.tempo(onset_envelope=onset_envelope, sr=sr)[0]
+    features['beat_strength'] = np.mean(librosa.feature.rms(y=y))
+    
+    # Tonality features
+    tonnetz = librosa.feature.tonnetz(y=y, sr=sr)
+    features.update({f'tonnetz_{i}': value for i, value in enumerate(tonnetz.mean(axis=1))})
+    
+    # Harmonic and percussive components
+    if compute_hpss:
+        stft_harmonic, stft_percussive = librosa.decompose.hpss(stft)
+        y_harmonic = librosa.istft(stft_harmonic, length=len(y))
+        y_percussive = librosa.istft(stft_percussive, length=len(y))
+        features['harmonic_ratio'] = np.mean(y_harmonic) / (np.mean(y_harmonic) + np.mean(y_percussive))
+    else:
+        features['spectral_tonality'] = 1.0 - np.mean(librosa.feature.spectral_flatness(S=S))
+    
+    return features
+
+
 class GenreDetectionService:
     """Service for detecting music genres using audio analysis and metadata"""
     
-    def __init__(self, sample_rate: int = 22050, duration_limit: int = 30):
+    def __init__(self, sample_rate: int = 22050, duration_limit: int = 30,
+                 cache_dir: Optional[str] = None, compute_hpss: bool = False):
         self.sample_rate = sample_rate
         self.duration_limit = duration_limit
+        self.cache_dir = cache_dir
+        self.compute_hpss = compute_hpss
         self.model = None
         self.scaler = StandardScaler()
         self.is_trained = False
         
+        # Audio worker processes, started on first use and kept for the session
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_workers = 0
+        self._worker_log_listener: Optional[logging.handlers.QueueListener] = None
+        
         # Genre mapping for consistency with playlists
         self.genre_mapping = {
             'house': Genre.HOUSE,
@@ -42,25 +347,155 @@ class GenreDetectionService:
             'electronic': Genre.ELECTRONIC,
             'experimental': Genre.EXPERIMENTAL
         }
+        
+        # Case-folded lookup so tags only need folding, not re-mapping, per track
+        self._genre_map_cf = {name.casefold(): genre for name, genre in self.genre_mapping.items()}
+    
+    @property
+    def feature_order(self) -> Tuple[str, ...]:
+        """Column order of the model's feature vector for the current extraction settings"""
+        return AUDIO_FEATURE_ORDER if self.compute_hpss else TONALITY_FEATURE_ORDER
     
     def analyze_track(self, track: TrackInfo, research_result: MusicResearchResult) -> GenreAnalysis:
         """Analyze a track to determine its genre"""
-        predicted_genre = Genre.UNKNOWN
-        confidence = 0.0
-        analysis_method = "metadata_only"
         audio_features = {}
-        metadata_features = {}
         
         # Try audio analysis if file path is available
-        if track.file_path and os.path.exists(track.file_path):
+        if track.file_path and existing_files([track.file_path]):
             try:
-                audio_features = self._extract_audio_features(track.file_path)
-                if self.is_trained and audio_features:
-                    predicted_genre, confidence = self._predict_from_audio(audio_features)
-                    analysis_method = "audio_analysis"
+                audio_features = self._extract_audio_features(track.file_path, track.bpm)
             except Exception as e:
                 logger.warning(f"Audio analysis failed for {track.title}: {e}")
         
+        audio_prediction = None
+        if self.is_trained and audio_features:
+            audio_prediction = self._predict_from_audio(audio_features)
+        
+        return self._build_analysis(track, research_result, audio_features, audio_prediction)
+    
+    def batch_analyze_tracks(self, tracks: List[TrackInfo],
+                             research_results: List[MusicResearchResult],
+                             max_workers: Optional[int] = None) -> List[GenreAnalysis]:
+        """Analyze many tracks at once
+        
+        Audio features are extracted in parallel processes and the model
+        predicts every track that has features in a single call.
+        """
+        file_paths = sorted(existing_files({track.file_path for track in tracks if track.file_path}))
+        bpm_by_path = {track.file_path: track.bpm for track in tracks if track.file_path and track.bpm}
+        
+        features_by_path = {}
+        if file_paths:
+            features_by_path = self._extract_batch_features(file_paths, max_workers, bpm_by_path)
+        
+        track_features = [features_by_path.get(track.file_path) or {} for track in tracks]
+        
+        audio_predictions = [None] * len(tracks)
+        if self.is_trained:
+            predictable = [i for i, features in enumerate(track_features) if features]
+            if predictable:
+                predictions = self._predict_from_audio_batch([track_features[i] for i in predictable])
+                for i, prediction in zip(predictable, predictions):
+                    audio_predictions[i] = prediction
+        
+        return [
+            self._build_analysis(track, research_result, audio_features, audio_prediction)
+            for track, research_result, audio_features, audio_prediction
+            in zip(tracks, research_results, track_features, audio_predictions)
+        ]
+    
+    def _extract_batch_features(self, file_paths: List[str], max_workers: Optional[int] = None,
+                                bpm_by_path: Optional[Dict[str, float]] = None) -> Dict[str, Dict[str, Any]]:
+        """Extract features for many files, keyed by file path
+        
+        Files are spread over worker processes; with a single worker (or a
+        single file) they are processed in this process instead.
+        """
+        workers = max_workers or os.cpu_count() or 1
+        bpm_by_path = bpm_by_path or {}
+        features_by_path = {}
+        
+        if workers > 1 and len(file_paths) > 1:
+            executor = self._audio_executor(workers)
+            futures = {
+                executor.submit(extract_audio_features, file_path, self.sample_rate,
+                                self.duration_limit, self.cache_dir, self.compute_hpss,
+                                bpm_by_path.get(file_path)): file_path
+                for file_path in file_paths
+            }
+            broken = False
+            for future in as_completed(futures):
+                file_path = futures[future]
+                try:
+                    features_by_path[file_path] = future.result()
+                except Exception as e:
+                    broken = broken or isinstance(e, BrokenProcessPool)
+                    logger.warning(f"Audio analysis failed for {file_path}: {e}")
+                    features_by_path[file_path] = {}
+            
+            # A worker died; start a fresh pool for the next batch
+            if broken:
+                self.close()
+            return features_by_path
+        
+        for file_path in file_paths:
+            features_by_path[file_path] = self._extract_audio_features(file_path, bpm_by_path.get(file_path))
+        
+        return features_by_path
+    
+    def _audio_executor(self, workers: int) -> ProcessPoolExecutor:
+        """Return the session's audio worker pool, starting it on first use
+        
+        Workers are spawned rather than forked: by the time a batch is
+        analyzed this process has Lexicon and research threads running, and
+        forking with live threads can leave a held lock in the child. The
+        pool is kept across batches so workers start (and import librosa)
+        only once; ``close`` shuts it down.
+        """
+        if self._executor is not None and self._executor_workers != workers:
+            self.close()
+        
+        if self._executor is None:
+            context = multiprocessing.get_context('spawn')
+            log_queue = context.Queue()
+            self._worker_log_listener = logging.handlers.QueueListener(log_queue, _WorkerLogForwarder())
+            self._worker_log_listener.start()
+            
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=context,
+                initializer=_init_audio_worker,
+                initargs=(log_queue, logging.getLogger().getEffectiveLevel())
+            )
+            self._executor_workers = workers
+        
+        return self._executor
+    
+    def close(self):
+        """Shut down the audio worker processes, if any were started"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+            self._executor_workers = 0
+        
+        # Stopped after the workers, so their last records still get through
+        if self._worker_log_listener is not None:
+            self._worker_log_listener.stop()
+            self._worker_log_listener = None
+    
+    def _build_analysis(self, track: TrackInfo, research_result: MusicResearchResult,
+                        audio_features: Dict[str, Any],
+                        audio_prediction: Optional[Tuple[Genre, float]]) -> GenreAnalysis:
+        """Combine the audio prediction (if any) with metadata into a GenreAnalysis"""
+        predicted_genre = Genre.UNKNOWN
+        confidence = 0.0
+        analysis_method = "metadata_only"
+        metadata_features = {}
+        
+        if audio_prediction is not None:
+            predicted_genre, confidence = audio_prediction
+            analysis_method = "audio_analysis"
+        
         # Fallback to metadata analysis
         if predicted_genre == Genre.UNKNOWN or confidence < 0.7:
             predicted_genre, confidence = self._predict_from_metadata(track, research_result)
@@ -83,50 +518,10 @@ class GenreDetectionService:
             playlist_suggestions=playlist_suggestions
         )
     
-    def _extract_audio_features(self, file_path: str) -> Dict[str, Any]:
+    def _extract_audio_features(self, file_path: str, known_bpm: Optional[float] = None) -> Dict[str, Any]:
         """Extract audio features from a music file"""
-        try:
-            # Load audio file
-            y, sr = librosa.load(file_path, sr=self.sample_rate, duration=self.duration_limit)
-            
-            # Extract various audio features
-            features = {}
-            
-            # Spectral features
-            features['spectral_centroid'] = np.mean(librosa.feature.spectral_centroid(y=y, sr=sr))
-            features['spectral_rolloff'] = np.mean(librosa.feature.spectral_rolloff(y=y, sr=sr))
-            features['spectral_bandwidth'] = np.mean(librosa.feature.spectral_bandwidth(y=y, sr=sr))
-            features['zero_crossing_rate'] = np.mean(librosa.feature.zero_crossing_rate(y))
-            
-            # MFCC features
-            mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-            for i in range(13):
-                features[f'mfcc_{i}'] = np.mean(mfccs[i])
-            
-            # Chroma features
-            chroma = librosa.feature.chroma_stft(y=y, sr=sr)
-            for i in range(12):
-                features[f'chroma_{i}'] = np.mean(chroma[i])
-            
-            # Rhythm features
-            tempo, beats = librosa.beat.beat_track(y=y, sr=sr)
-            features['tempo'] = tempo
-            features['beat_strength'] = np.mean(librosa.feature.rms(y=y))
-            
-            # Tonality features
-            tonnetz = librosa.feature.tonnetz(y=y, sr=sr)
-            for i in range(6):
-                features[f'tonnetz_{i}'] = np.mean(tonnetz[i])
-            
-            # Harmonic and percussive components
-            y_harmonic, y_percussive = librosa.effects.hpss(y)
-            features['harmonic_ratio'] = np.mean(y_harmonic) / (np.mean(y_harmonic) + np.mean(y_percussive))
-            
-            return features
-            
-        except Exception as e:
-            logger.error(f"Failed to extract audio features from {file_path}: {e}")
-            return {}
+        return extract_audio_features(file_path, self.sample_rate, self.duration_limit,
+                                      self.cache_dir, self.compute_hpss, known_bpm)
     
     def _extract_metadata_features(self, track: TrackInfo, research_result: MusicResearchResult) -> Dict[str, Any]:
         """Extract features from track metadata"""
@@ -161,35 +556,39 @@ class GenreDetectionService:
     
     def _predict_from_audio(self, audio_features: Dict[str, Any]) -> Tuple[Genre, float]:
         """Predict genre from audio features using trained model"""
-        if not self.is_trained or not self.model:
-            return Genre.UNKNOWN, 0.0
+        return self._predict_from_audio_batch([audio_features])[0]
+    
+    def _predict_from_audio_batch(self, feature_dicts: List[Dict[str, Any]]) -> List[Tuple[Genre, float]]:
+        """Predict genres for many tracks with a single scaler/model pass"""
+        unknown = [(Genre.UNKNOWN, 0.0)] * len(feature_dicts)
+        if not self.is_trained or not self.model or not feature_dicts:
+            return unknown
         
         try:
-            # Convert features to array
-            feature_array = np.array([list(audio_features.values())])
+            # Stack features into one (tracks x features) matrix
+            feature_matrix = np.empty((len(feature_dicts), len(self.feature_order)), dtype=np.float32)
+            for i, features in enumerate(feature_dicts):
+                feature_matrix[i] = self._feature_vector(features)
             
             # Scale features
-            feature_array_scaled = self.scaler.transform(feature_array)
+            feature_matrix_scaled = self.scaler.transform(feature_matrix)
             
-            # Make prediction
-            prediction = self.model.predict(feature_array_scaled)[0]
-            probabilities = self.model.predict_proba(feature_array_scaled)[0]
-            
-            # Get confidence (max probability)
-            confidence = np.max(probabilities)
-            
-            # Convert prediction to Genre enum
-            genre_names = self.model.classes_
-            predicted_genre_name = genre_names[prediction]
+            # The most probable class is the prediction, so one predict_proba
+            # call gives both the labels and their confidences
+            probabilities = self.model.predict_proba(feature_matrix_scaled)
+            best_indices = probabilities.argmax(axis=1)
+            confidences = probabilities.max(axis=1)
             
             # Map to our Genre enum
-            predicted_genre = self.genre_mapping.get(predicted_genre_name.lower(), Genre.UNKNOWN)
-            
-            return predicted_genre, confidence
+            genre_names = self.model.classes_
+            return [
+                (self._genre_map_cf.get(genre_names[index].casefold(), Genre.UNKNOWN), float(confidence))
+                for index, confidence in zip(best_indices, confidences)
+            ]
             
         except Exception as e:
             logger.error(f"Audio prediction failed: {e}")
-            return Genre.UNKNOWN, 0.0
+            return unknown
     
     def _predict_from_metadata(self, track: TrackInfo, research_result: MusicResearchResult) -> Tuple[Genre, float]:
         """Predict genre from metadata using rule-based approach"""
@@ -200,20 +599,12 @@ class GenreDetectionService:
         if not genres:
             return predicted_genre, confidence
         
-        # Count genre occurrences
-        genre_counts = {}
-        for genre in genres:
-            genre_lower = genre.lower()
-            genre_counts[genre_lower] = genre_counts.get(genre_lower, 0) + 1
-        
-        # Find the most common genre
-        if genre_counts:
-            most_common = max(genre_counts.items(), key=lambda x: x[1])
-            predicted_genre_name = most_common[0]
-            confidence = most_common[1] / len(genres)
-            
-            # Map to our Genre enum
-            predicted_genre = self.genre_mapping.get(predicted_genre_name, Genre.UNKNOWN)
+        # Find the most common genre (ties go to the first one seen)
+        predicted_genre_name, count = Counter(genre.casefold() for genre in genres).most_common(1)[0]
+        confidence = count / len(genres)
+        
+        # Map to our Genre enum
+        predicted_genre = self._genre_map_cf.get(predicted_genre_name, Genre.UNKNOWN)
         
         # Special handling for remixes
         if research_result.is_remix and predicted_genre != Genre.UNKNOWN:
@@ -223,65 +614,40 @@ class GenreDetectionService:
         
         return predicted_genre, confidence
     
-    def _generate_playlist_suggestions(self, genre: Genre) -> List[str]:
+    def _generate_playlist_suggestions(self, genre: Genre) -> Sequence[str]:
         """Generate playlist suggestions based on predicted genre"""
-        suggestions = []
-        
-        # Map genres to common playlist names
-        playlist_mapping = {
-            Genre.HOUSE: ["House Music", "Deep House", "House Classics"],
-            Genre.DEEP_HOUSE: ["Deep House", "House Music", "Chill House"],
-            Genre.TECHNO: ["Techno", "Dark Techno", "Industrial Techno"],
-            Genre.TRANCE: ["Trance", "Progressive Trance", "Uplifting Trance"],
-            Genre.DUBSTEP: ["Dubstep", "Bass Music", "Electronic"],
-            Genre.DRUM_AND_BASS: ["Drum & Bass", "DnB", "Liquid DnB"],
-            Genre.BREAKBEAT: ["Breakbeat", "Big Beat", "Breaks"],
-            Genre.AMBIENT: ["Ambient", "Chillout", "Relaxing"],
-            Genre.DOWNTEMPO: ["Downtempo", "Chill", "Lounge"],
-            Genre.PROGRESSIVE: ["Progressive", "Progressive House", "Progressive Trance"],
-            Genre.FUTURE_BASS: ["Future Bass", "Bass Music", "Electronic"],
-            Genre.TRAP: ["Trap", "Hip Hop", "Bass Music"],
-            Genre.ELECTRONIC: ["Electronic", "EDM", "Electronic Music"],
-            Genre.EXPERIMENTAL: ["Experimental", "Avant-garde", "Abstract"]
-        }
-        
-        suggestions = playlist_mapping.get(genre, ["Electronic", "Music"])
-        return suggestions
+        return _PLAYLIST_SUGGESTIONS.get(genre, _DEFAULT_PLAYLIST_SUGGESTIONS)
     
-    def train_model(self, training_data: List[Tuple[Dict[str, Any], str]]) -> bool:
-        """Train the genre classification model"""
+    def train_model(self, training_data: Iterable[Tuple[Dict[str, Any], str]]) -> bool:
+        """Train the genre classification model
+        
+        ``training_data`` may be any iterable of ``(features, genre)`` pairs,
+        including a generator, so large datasets can be streamed in.
+        """
         try:
-            if not training_data:
-                logger.warning("No training data provided")
-                return False
-            
             # Separate features and labels
-            X = []
-            y = []
-            
-            for features, genre in training_data:
-                X.append(list(features.values()))
-                y.append(genre)
+            X, y = self._build_training_arrays(training_data)
             
-            # Convert to numpy arrays
-            X = np.array(X)
-            y = np.array(y)
+            if not len(y):
+                logger.warning("No training data provided")
+                return False
             
             # Split data
             X_train, X_test, y_train, y_test = train_test_split(
                 X, y, test_size=0.2, random_state=42
             )
+            del X
             
             # Scale features
             X_train_scaled = self.scaler.fit_transform(X_train)
             X_test_scaled = self.scaler.transform(X_test)
+            del X_train, X_test
             
             # Train model
-            self.model = RandomForestClassifier(
-                n_estimators=100,
-                random_state=42,
-                max_depth=10,
-                min_samples_split=5
+            self.model = HistGradientBoostingClassifier(
+                max_iter=200,
+                max_leaf_nodes=31,
+                random_state=42
             )
             
             self.model.fit(X_train_scaled, y_train)
@@ -299,6 +665,49 @@ class GenreDetectionService:
             logger.error(f"Model training failed: {e}")
             return False
     
+    def _feature_vector(self, features: Dict[str, Any]) -> np.ndarray:
+        """Lay out a feature dict as a float32 vector in ``feature_order``"""
+        return np.fromiter((features[name] for name in self.feature_order),
+                           dtype=np.float32, count=len(self.feature_order))
+    
+    def _build_training_arrays(self, training_data: Iterable[Tuple[Dict[str, Any], str]]
+                               ) -> Tuple[np.ndarray, np.ndarray]:
+        """Fill a float32 feature matrix in place from the training pairs
+        
+        The matrix is preallocated when the data's length is known and grown
+        geometrically otherwise, so no per-row Python lists are kept around.
+        Data with only one of ``harmonic_ratio`` and ``spectral_tonality``
+        sets ``compute_hpss`` to match, so tracks are analyzed the way the
+        model was trained.
+        """
+        rows = iter(training_data)
+        first = next(rows, None)
+        if first is None:
+            return np.empty((0, 0), dtype=np.float32), np.array([])
+        
+        first_features = first[0]
+        if ('harmonic_ratio' in first_features) != ('spectral_tonality' in first_features):
+            self.compute_hpss = 'harmonic_ratio' in first_features
+        
+        n_features = len(self.feature_order)
+        capacity = len(training_data) if isinstance(training_data, Sized) else 1024
+        X = np.empty((capacity, n_features), dtype=np.float32)
+        labels = []
+        
+        for i, (features, genre) in enumerate(chain([first], rows)):
+            missing = [name for name in self.feature_order if name not in features]
+            if missing:
+                raise ValueError(f"Training sample {i} is missing features: {', '.join(missing)}")
+            
+            if i == capacity:
+                capacity *= 2
+                X.resize((capacity, n_features), refcheck=False)
+            X[i] = self._feature_vector(features)
+            labels.append(genre)
+        
+        X.resize((len(labels), n_features), refcheck=False)
+        return X, np.array(labels)
+    
     def save_model(self, file_path: str) -> bool:
         """Save the trained model to disk"""
         try:
@@ -309,11 +718,11 @@ class GenreDetectionService:
             model_data = {
                 'model': self.model,
                 'scaler': self.scaler,
-                'is_trained': self.is_trained
+                'is_trained': self.is_trained,
+                'feature_order': self.feature_order
             }
             
-            with open(file_path, 'wb') as f:
-                pickle.dump(model_data, f)
+            joblib.dump(model_data, file_path, compress=3)
             
             logger.info(f"Model saved to {file_path}")
             return True
@@ -329,12 +738,25 @@ class GenreDetectionService:
                 logger.warning(f"Model file not found: {file_path}")
                 return False
             
-            with open(file_path, 'rb') as f:
-                model_data = pickle.load(f)
+            # joblib also reads models saved as plain pickles by older versions
+            model_data = joblib.load(file_path)
+            
+            # Models saved before the feature order was stored were trained
+            # on HPSS features
+            feature_order = tuple(model_data.get('feature_order', AUDIO_FEATURE_ORDER))
+            if feature_order not in (AUDIO_FEATURE_ORDER, TONALITY_FEATURE_ORDER):
+                logger.error(f"Model {file_path} was trained on unknown audio features")
+                return False
+            
+            compute_hpss = feature_order == AUDIO_FEATURE_ORDER
+            if compute_hpss != self.compute_hpss:
+                logger.info(f"Model was trained {'with' if compute_hpss else 'without'} HPSS features, "
+                            f"extracting features to match")
             
             self.model = model_data['model']
             self.scaler = model_data['scaler']
             self.is_trained = model_data['is_trained']
+            self.compute_hpss = compute_hpss
             
             logger.info(f"Model loaded from {file_path}")
             return True
@@ -1,26 +1,50 @@
 import requests
 import logging
-from typing import List, Dict, Any, Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import List, Dict, Any, Iterator, Optional, Set, Tuple
 from ..models.track_models import TrackInfo, PlaylistInfo, GenreAnalysis
 
 logger = logging.getLogger(__name__)
 
+# Responses that mean a bulk endpoint doesn't exist (as opposed to failing this time)
+BULK_UNSUPPORTED_STATUSES = (400, 404, 405)
+
 
 class LexiconService:
     """Service for interacting with Lexicon music organizer API"""
     
-    def __init__(self, base_url: str = "http://localhost:48624", api_version: str = "v1"):
+    def __init__(self, base_url: str = "http://localhost:48624", api_version: str = "v1",
+                 timeout: Tuple[float, float] = (3, 30)):
         self.base_url = base_url
         self.api_version = api_version
+        self.timeout = timeout
         self.session = requests.Session()
         self.session.headers.update({
             'Content-Type': 'application/json',
-            'Accept': 'application/json'
+            'Accept': 'application/json',
+            'Connection': 'keep-alive'
         })
+        
+        # Keep enough pooled connections for concurrent calls and retry
+        # transient gateway errors with a short backoff
+        adapter = HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=32,
+            max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
+        # Whether the bulk endpoints exist; None until the first attempt
+        self._bulk_updates_supported = None
+        self._bulk_playlist_adds_supported = None
     
     def _make_request(self, method: str, endpoint: str, **kwargs) -> Optional[Dict[str, Any]]:
         """Make a request to the Lexicon API"""
         url = f"{self.base_url}/{self.api_version}/{endpoint}"
+        kwargs.setdefault('timeout', self.timeout)
         
         try:
             response = self.session.request(method, url, **kwargs)
@@ -30,6 +54,63 @@ class LexiconService:
             logger.error(f"API request failed: {e}")
             return None
     
+    def _request_with_status(self, method: str, endpoint: str,
+                             **kwargs) -> Tuple[Optional[int], Optional[Dict[str, Any]]]:
+        """Like ``_make_request``, but also return the HTTP status (None if no response came back)"""
+        url = f"{self.base_url}/{self.api_version}/{endpoint}"
+        kwargs.setdefault('timeout', self.timeout)
+        
+        try:
+            response = self.session.request(method, url, **kwargs)
+            response.raise_for_status()
+            return response.status_code, response.json() if response.content else {}
+        except requests.exceptions.HTTPError as e:
+            logger.error(f"API request failed: {e}")
+            return e.response.status_code if e.response is not None else None, None
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.error(f"API request failed: {e}")
+            return None, None
+    
+    def _send_bulk(self, method: str, endpoint: str, payload: Any,
+                   track_ids: List[str]) -> Tuple[Optional[bool], Optional[Set[str]]]:
+        """Try a bulk request
+        
+        Returns whether the bulk endpoint is supported (False only on a
+        definitive 400/404/405, True once a response listed applied tracks,
+        None if this attempt says neither) and the track IDs the response
+        confirmed. The IDs are None when a successful response lists none,
+        so callers can tell an unverifiable success from a failed request.
+        """
+        status, data = self._request_with_status(method, endpoint, json=payload)
+        if status in BULK_UNSUPPORTED_STATUSES:
+            return False, set()
+        if data is None:
+            return None, set()
+        
+        reported = self._confirmed_track_ids(data)
+        if not reported:
+            return None, None
+        
+        return True, {track_id for track_id in track_ids if str(track_id) in reported}
+    
+    @staticmethod
+    def _confirmed_track_ids(data: Optional[Dict[str, Any]]) -> Set[str]:
+        """Track IDs a bulk response reports as applied, under 'trackIds' or 'tracks'"""
+        if not isinstance(data, dict):
+            return set()
+        
+        confirmed = set()
+        for key in ('trackIds', 'tracks'):
+            items = data.get(key)
+            if not isinstance(items, list):
+                continue
+            for item in items:
+                track_id = item.get('id') if isinstance(item, dict) else item
+                if track_id is not None:
+                    confirmed.add(str(track_id))
+        
+        return confirmed
+    
     def get_tracks(self, limit: int = 100, offset: int = 0) -> List[TrackInfo]:
         """Get tracks from Lexicon library"""
         params = {'limit': limit, 'offset': offset}
@@ -56,25 +137,47 @@ class LexiconService:
         
         return tracks
     
-    def get_all_tracks(self) -> List[TrackInfo]:
+    def get_all_tracks(self, limit: int = 100, max_workers: int = 8) -> List[TrackInfo]:
         """Get all tracks from the library (paginated)"""
-        all_tracks = []
-        offset = 0
-        limit = 100
-        
-        while True:
-            tracks = self.get_tracks(limit=limit, offset=offset)
-            if not tracks:
-                break
-            
-            all_tracks.extend(tracks)
-            offset += limit
-            
-            # If we got fewer tracks than requested, we've reached the end
-            if len(tracks) < limit:
-                break
-        
-        return all_tracks
+        return list(self.iter_tracks(limit=limit, max_workers=max_workers))
+    
+    def iter_tracks(self, limit: int = 100, max_workers: int = 8) -> Iterator[TrackInfo]:
+        """Yield every track in the library, in order, as pages arrive
+        
+        Up to ``max_workers`` pages are fetched ahead concurrently, so callers
+        can work through one page while the next ones download. No new pages
+        are requested once a short or empty page shows where the library ends.
+        """
+        pages = {}
+        pending = {}
+        next_offset = 0
+        next_page = 0
+        end_offset = None
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while end_offset is None or next_page <= end_offset:
+                # Keep the window full until we know where the library ends
+                while end_offset is None and len(pending) < max_workers:
+                    pending[executor.submit(self.get_tracks, limit=limit, offset=next_offset)] = next_offset
+                    next_offset += limit
+                
+                if next_page in pages:
+                    yield from pages.pop(next_page)
+                    next_page += limit
+                    continue
+                
+                if not pending:
+                    break
+                
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    offset = pending.pop(future)
+                    tracks = future.result()
+                    pages[offset] = tracks
+                    
+                    # If we got fewer tracks than requested, we've reached the end
+                    if len(tracks) < limit and (end_offset is None or offset < end_offset):
+                        end_offset = offset
     
     def update_track_genre(self, track_id: str, genre: str) -> bool:
         """Update the genre of a track"""
@@ -87,6 +190,38 @@ class LexiconService:
         result = self._make_request('PUT', f'tracks/{track_id}', json=metadata)
         return result is not None
     
+    def bulk_update_tracks(self, updates: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, bool]:
+        """Update metadata for many tracks, returning success per track ID
+        
+        Uses a single bulk request when Lexicon supports it. Tracks the bulk
+        response doesn't confirm fall back to concurrent per-track updates.
+        """
+        if not updates:
+            return {}
+        
+        status: Dict[str, bool] = {}
+        if self._bulk_updates_supported is not False:
+            payload = [{'id': track_id, **metadata} for track_id, metadata in updates]
+            supported, confirmed = self._send_bulk('PUT', 'tracks/bulk', payload,
+                                                   [track_id for track_id, _ in updates])
+            if supported is False:
+                logger.debug("Bulk track updates unavailable, updating tracks individually")
+            elif confirmed is None:
+                # Accepted without saying what was applied. Updates are
+                # idempotent, so resend them individually, and stop sending
+                # bulk updates whose outcome can't be checked.
+                logger.debug("Bulk track updates don't report applied tracks, updating tracks individually")
+                supported = False
+            if supported is not None:
+                self._bulk_updates_supported = supported
+            status = dict.fromkeys(confirmed or (), True)
+        
+        remaining = [(track_id, metadata) for track_id, metadata in updates if track_id not in status]
+        results = self._send_each([('PUT', f'tracks/{track_id}', metadata) for track_id, metadata in remaining])
+        status.update((track_id, success) for (track_id, _), success in zip(remaining, results))
+        
+        return {track_id: status[track_id] for track_id, _ in updates}
+    
     def get_playlists(self) -> List[PlaylistInfo]:
         """Get all playlists"""
         data = self._make_request('GET', 'playlists')
@@ -113,6 +248,59 @@ class LexiconService:
         result = self._make_request('POST', f'playlists/{playlist_id}/tracks', json=data)
         return result is not None
     
+    def add_tracks_to_playlist(self, playlist_id: str, track_ids: List[str]) -> Dict[str, bool]:
+        """Add many tracks to a playlist, returning success per track ID
+        
+        Tracks are only counted as added by the bulk request when its response
+        lists them; the rest are added one by one. A successful response that
+        lists no tracks is checked against the playlist instead of resending
+        every addition, which could add the tracks twice.
+        """
+        if not track_ids:
+            return {}
+        
+        status: Dict[str, bool] = {}
+        if self._bulk_playlist_adds_supported is not False:
+            supported, confirmed = self._send_bulk('POST', f'playlists/{playlist_id}/tracks',
+                                                   {'trackIds': track_ids}, track_ids)
+            if supported is False:
+                logger.debug("Bulk playlist additions unavailable, adding tracks individually")
+            elif confirmed is None:
+                in_playlist = self._playlist_track_id_set(playlist_id)
+                if in_playlist is None:
+                    # Can't check; take the success at its word rather than
+                    # risk duplicates, and add tracks individually from now on
+                    confirmed = set(track_ids)
+                    supported = False
+                else:
+                    confirmed = {track_id for track_id in track_ids if str(track_id) in in_playlist}
+                    supported = bool(confirmed)
+            if supported is not None:
+                self._bulk_playlist_adds_supported = supported
+            status = dict.fromkeys(confirmed, True)
+        
+        remaining = [track_id for track_id in track_ids if track_id not in status]
+        results = self._send_each([
+            ('POST', f'playlists/{playlist_id}/tracks', {'trackId': track_id}) for track_id in remaining
+        ])
+        status.update(zip(remaining, results))
+        
+        return {track_id: status[track_id] for track_id in track_ids}
+    
+    def _send_each(self, calls: List[Tuple[str, str, Dict[str, Any]]]) -> List[bool]:
+        """Send ``(method, endpoint, json)`` requests concurrently over the pooled session
+        
+        Returns whether each request succeeded, in order.
+        """
+        if not calls:
+            return []
+        
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = executor.map(
+                lambda call: self._make_request(call[0], call[1], json=call[2]), calls
+            )
+            return [result is not None for result in results]
+    
     def get_playlist_tracks(self, playlist_id: str) -> List[str]:
         """Get track IDs in a playlist"""
         data = self._make_request('GET', f'playlists/{playlist_id}/tracks')
@@ -122,10 +310,19 @@ class LexiconService:
         
         return [track.get('id') for track in data.get('tracks', [])]
     
+    def _playlist_track_id_set(self, playlist_id: str) -> Optional[Set[str]]:
+        """IDs of the tracks in a playlist as strings, or None if they couldn't be fetched"""
+        data = self._make_request('GET', f'playlists/{playlist_id}/tracks')
+        if data is None:
+            return None
+        
+        return {str(track.get('id')) for track in data.get('tracks', [])}
+    
     def test_connection(self) -> bool:
         """Test connection to Lexicon API"""
         try:
-            response = self.session.get(f"{self.base_url}/{self.api_version}/status")
+            response = self.session.get(f"{self.base_url}/{self.api_version}/status",
+                                        timeout=self.timeout)
             return response.status_code == 200
         except requests.exceptions.RequestException:
             return False
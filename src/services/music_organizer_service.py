@@ -1,8 +1,13 @@
 import logging
 import time
-from typing import List, Dict, Any, Optional
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Set, Tuple
+import pandas as pd
 from tqdm import tqdm
 from ..models.track_models import TrackInfo, GenreAnalysis, PlaylistInfo
+from . import async_lexicon_service
 from .lexicon_service import LexiconService
 from .music_research_service import MusicResearchService
 from .genre_detection_service import GenreDetectionService
@@ -10,6 +15,9 @@ from .playlist_matching_service import PlaylistMatchingService
 
 logger = logging.getLogger(__name__)
 
+# Libraries at least this large are analyzed with pandas instead of a Python loop
+VECTORIZED_ANALYSIS_MIN_TRACKS = 10000
+
 
 class MusicOrganizerService:
     """Main service that orchestrates the music organization process"""
@@ -18,19 +26,35 @@ class MusicOrganizerService:
         self.config = config
         
         # Initialize services
-        self.lexicon_service = LexiconService(
+        lexicon_service_class = LexiconService
+        if config.get('LEXICON_ASYNC'):
+            if async_lexicon_service.httpx is not None:
+                lexicon_service_class = async_lexicon_service.AsyncLexiconService
+            else:
+                logger.warning("LEXICON_ASYNC is set but httpx is not installed; using synchronous requests")
+        
+        self.lexicon_service = lexicon_service_class(
             base_url=config.get('LEXICON_API_URL', 'http://localhost:48624'),
             api_version=config.get('LEXICON_API_VERSION', 'v1')
         )
         
         self.music_research_service = MusicResearchService(
             lastfm_api_key=config.get('LASTFM_API_KEY'),
-            musicbrainz_user_agent=config.get('MUSICBRAINZ_USER_AGENT', 'GenreBendPro/1.0')
+            musicbrainz_user_agent=config.get('MUSICBRAINZ_USER_AGENT', 'GenreBendPro/1.0'),
+            max_concurrency=config.get('RESEARCH_CONCURRENCY', 8),
+            lastfm_rate_limit=config.get('LASTFM_RATE_LIMIT', 5.0),
+            musicbrainz_rate_limit=config.get('MUSICBRAINZ_RATE_LIMIT', 1.0),
+            musicbrainz_search_limit=config.get('MUSICBRAINZ_SEARCH_LIMIT', 5),
+            max_retries=config.get('MAX_RETRIES', 3),
+            cache_dir=config.get('RESEARCH_CACHE_DIR'),
+            cache_ttl=config.get('RESEARCH_CACHE_TTL_DAYS', 30) * 24 * 3600
         )
         
         self.genre_detection_service = GenreDetectionService(
             sample_rate=config.get('AUDIO_SAMPLE_RATE', 22050),
-            duration_limit=config.get('AUDIO_DURATION_LIMIT', 30)
+            duration_limit=config.get('AUDIO_DURATION_LIMIT', 30),
+            cache_dir=config.get('FEATURE_CACHE_DIR'),
+            compute_hpss=config.get('AUDIO_COMPUTE_HPSS', False)
         )
         
         self.playlist_matching_service = PlaylistMatchingService()
@@ -40,6 +64,11 @@ class MusicOrganizerService:
         self.max_retries = config.get('MAX_RETRIES', 3)
         self.retry_delay = config.get('RETRY_DELAY', 1.0)
         self.confidence_threshold = config.get('CONFIDENCE_THRESHOLD', 0.7)
+        self.keep_details = config.get('KEEP_DETAILS', False)
+        self.lexicon_workers = config.get('LEXICON_WORKERS', 8)
+        
+        # Track IDs per playlist, fetched once per run and kept current as tracks are added
+        self._playlist_tracks: Dict[str, Set[str]] = {}
     
     def organize_music_collection(self, dry_run: bool = False) -> Dict[str, Any]:
         """Main method to organize the entire music collection"""
@@ -51,14 +80,16 @@ class MusicOrganizerService:
             return {'success': False, 'error': 'Lexicon API connection failed'}
         
         try:
-            # Get all tracks from Lexicon
+            # Stream tracks from Lexicon; later pages download while earlier
+            # batches are processed
             logger.info("Fetching tracks from Lexicon...")
-            tracks = self.lexicon_service.get_all_tracks()
-            logger.info(f"Found {len(tracks)} tracks to process")
+            tracks = self.lexicon_service.iter_tracks()
+            first_track = next(tracks, None)
             
-            if not tracks:
+            if first_track is None:
                 logger.warning("No tracks found in Lexicon library")
                 return {'success': True, 'message': 'No tracks to process'}
+            tracks = chain([first_track], tracks)
             
             # Get existing playlists
             logger.info("Fetching existing playlists...")
@@ -67,6 +98,7 @@ class MusicOrganizerService:
             
             # Process tracks in batches
             results = self._process_tracks_batch(tracks, playlists, dry_run)
+            logger.info(f"Processed {results['processed']} tracks")
             
             # Generate summary
             summary = self._generate_summary(results)
@@ -81,83 +113,244 @@ class MusicOrganizerService:
         except Exception as e:
             logger.error(f"Music organization failed: {e}")
             return {'success': False, 'error': str(e)}
+        finally:
+            # Stop the audio worker processes started for this run
+            self.genre_detection_service.close()
     
-    def _process_tracks_batch(self, tracks: List[TrackInfo], playlists: List[PlaylistInfo], 
+    def _process_tracks_batch(self, tracks: Iterable[TrackInfo], playlists: List[PlaylistInfo], 
                             dry_run: bool) -> Dict[str, Any]:
-        """Process tracks in batches"""
-        results = {
-            'processed': 0,
-            'updated': 0,
-            'playlist_additions': 0,
-            'errors': 0,
-            'skipped': 0,
-            'details': []
-        }
+        """Process tracks in batches
         
-        # Process tracks in batches
-        for i in range(0, len(tracks), self.batch_size):
-            batch = tracks[i:i + self.batch_size]
-            logger.info(f"Processing batch {i//self.batch_size + 1}/{(len(tracks) + self.batch_size - 1)//self.batch_size}")
-            
-            batch_results = self._process_batch(batch, playlists, dry_run)
-            
-            # Aggregate results
-            for key in ['processed', 'updated', 'playlist_additions', 'errors', 'skipped']:
-                results[key] += batch_results[key]
-            
-            results['details'].extend(batch_results['details'])
+        ``tracks`` may be a lazy iterator; only one batch is held at a time.
+        Summary counts are aggregated as batches finish. Per-track details are
+        only kept when ``KEEP_DETAILS`` is set, so large libraries don't hold
+        a result dict for every track.
+        """
+        results = self._new_totals()
+        
+        self._playlist_tracks = {}
+        if not dry_run:
+            self._prefetch_playlist_tracks(playlists)
+        
+        # One progress bar for the whole run; the total isn't known up front
+        # because tracks are streamed
+        with tqdm(desc="Processing tracks", unit="track", mininterval=0.5, smoothing=0.1) as progress:
+            # Tracks that already have a high-confidence genre are skipped here,
+            # so batches (and their concurrent research) only hold real work
+            pending = self._tracks_needing_work(tracks, results, progress)
             
-            # Add delay between batches to avoid overwhelming APIs
-            if i + self.batch_size < len(tracks):
-                time.sleep(self.retry_delay)
+            # Process tracks in batches
+            batch_number = 0
+            while True:
+                batch = list(islice(pending, self.batch_size))
+                if not batch:
+                    break
+                
+                # Back off between batches only while the APIs are throttling us
+                if batch_number:
+                    self._wait_for_api_pressure()
+                
+                batch_number += 1
+                logger.info(f"Processing batch {batch_number} ({len(batch)} tracks)")
+                
+                # Batches count straight into the run totals
+                self._process_batch(batch, playlists, dry_run, totals=results, progress=progress)
         
         return results
     
-    def _process_batch(self, tracks: List[TrackInfo], playlists: List[PlaylistInfo], 
-                      dry_run: bool) -> Dict[str, Any]:
-        """Process a batch of tracks"""
-        batch_results = {
+    def _wait_for_api_pressure(self):
+        """Sleep in proportion to how many recent API responses were throttled
+        
+        Healthy runs don't pause at all. Under sustained throttling the gap
+        grows to ``4 * RETRY_DELAY``.
+        """
+        delay = self.retry_delay * 4 * self.music_research_service.throttle_ratio()
+        if delay > 0.05:
+            logger.info(f"APIs are throttling requests, pausing {delay:.1f}s before the next batch")
+            time.sleep(delay)
+    
+    def _new_totals(self) -> Dict[str, Any]:
+        """Create the counters that batch results are aggregated into"""
+        return {
             'processed': 0,
             'updated': 0,
             'playlist_additions': 0,
             'errors': 0,
             'skipped': 0,
+            'genre_distribution': Counter(),
+            'remix_analysis': {'total_remixes': 0, 'processed_remixes': 0},
             'details': []
         }
+    
+    def _tracks_needing_work(self, tracks: Iterable[TrackInfo], results: Dict[str, Any],
+                             progress: Optional[tqdm] = None) -> Iterator[TrackInfo]:
+        """Yield the tracks to process, counting the skipped ones into ``results``"""
+        for track in tracks:
+            if not self._has_confident_genre(track):
+                yield track
+                continue
+            
+            logger.debug(f"Skipping {track.title} - already has high-confidence genre")
+            results['processed'] += 1
+            results['skipped'] += 1
+            if self.keep_details:
+                results['details'].append(self._skipped_result(track))
+            if progress is not None:
+                progress.update(1)
+    
+    def _process_batch(self, tracks: List[TrackInfo], playlists: List[PlaylistInfo], 
+                      dry_run: bool, totals: Optional[Dict[str, Any]] = None,
+                      progress: Optional[tqdm] = None) -> Dict[str, Any]:
+        """Process a batch of tracks
         
-        for track in tqdm(tracks, desc="Processing tracks"):
+        Counts are added to ``totals`` when given (the run's results, which
+        then only get details with ``KEEP_DETAILS``), otherwise to a new dict
+        for this batch. The dict counted into is returned. ``progress`` is
+        the run's progress bar, advanced once per track. Tracks with a
+        confident genre are expected to have been filtered out already by
+        ``_tracks_needing_work``.
+        """
+        batch_results = totals if totals is not None else self._new_totals()
+        keep_details = totals is None or self.keep_details
+        
+        analyses = self._analyze_batch(tracks)
+        processed = []
+        
+        for track in tracks:
             try:
-                result = self._process_single_track(track, playlists, dry_run)
-                batch_results['processed'] += 1
-                
-                if result['success']:
-                    if result['updated']:
-                        batch_results['updated'] += 1
-                    if result['playlist_additions'] > 0:
-                        batch_results['playlist_additions'] += result['playlist_additions']
-                    if result['skipped']:
-                        batch_results['skipped'] += 1
-                else:
-                    batch_results['errors'] += 1
-                
-                batch_results['details'].append(result)
+                result = self._process_single_track(track, playlists, dry_run, analyses.get(track.id))
+                processed.append(result)
+                if keep_details:
+                    batch_results['details'].append(result)
                 
             except Exception as e:
                 logger.error(f"Error processing track {track.title}: {e}")
                 batch_results['errors'] += 1
-                batch_results['details'].append({
-                    'track_id': track.id,
-                    'track_title': track.title,
-                    'success': False,
-                    'error': str(e)
-                })
+                if keep_details:
+                    batch_results['details'].append({
+                        'track_id': track.id,
+                        'track_title': track.title,
+                        'success': False,
+                        'error': str(e)
+                    })
+            
+            if progress is not None:
+                progress.update(1)
+        
+        # Send the queued Lexicon writes for the whole batch at once
+        self._apply_pending_writes(processed)
+        
+        for result in processed:
+            batch_results['processed'] += 1
+            
+            if result['success']:
+                if result['updated']:
+                    batch_results['updated'] += 1
+                if result['playlist_additions'] > 0:
+                    batch_results['playlist_additions'] += result['playlist_additions']
+                if result['skipped']:
+                    batch_results['skipped'] += 1
+            else:
+                batch_results['errors'] += 1
+            
+            analysis = result.get('analysis')
+            if analysis:
+                batch_results['genre_distribution'][analysis.predicted_genre.value] += 1
+                
+                # Count remixes
+                if analysis.is_remix:
+                    batch_results['remix_analysis']['total_remixes'] += 1
+                    if result['success']:
+                        batch_results['remix_analysis']['processed_remixes'] += 1
         
         return batch_results
     
-    def _process_single_track(self, track: TrackInfo, playlists: List[PlaylistInfo], 
-                             dry_run: bool) -> Dict[str, Any]:
-        """Process a single track"""
-        result = {
+    def _apply_pending_writes(self, results: List[Dict[str, Any]]):
+        """Apply the genre updates and playlist additions queued by a batch
+        
+        Genre updates go out in one bulk call. Playlist additions are grouped
+        per playlist. As with an immediate write, a track whose genre update
+        fails is marked as an error and is not added to any playlist.
+        """
+        genre_updates = [
+            (result['track_id'], {'genre': result['genre_update']})
+            for result in results if result.get('genre_update')
+        ]
+        update_status = self.lexicon_service.bulk_update_tracks(genre_updates)
+        
+        additions_by_playlist = {}
+        for result in results:
+            if result.pop('genre_update', None):
+                if update_status.get(result['track_id']):
+                    result['updated'] = True
+                else:
+                    logger.error(f"Failed to update genre for {result['track_title']}")
+                    result['success'] = False
+                    result['error'] = "Failed to update genre"
+                    result.pop('playlist_targets', None)
+                    continue
+            
+            for playlist_id in result.pop('playlist_targets', []):
+                additions_by_playlist.setdefault(playlist_id, []).append(result)
+        
+        for playlist_id, playlist_results in additions_by_playlist.items():
+            added = self.lexicon_service.add_tracks_to_playlist(
+                playlist_id, [result['track_id'] for result in playlist_results]
+            )
+            for result in playlist_results:
+                if added.get(result['track_id']):
+                    result['playlist_additions'] += 1
+                    self._playlist_track_ids(playlist_id).add(result['track_id'])
+                else:
+                    logger.warning(f"Failed to add {result['track_title']} to playlist {playlist_id}")
+    
+    def _prefetch_playlist_tracks(self, playlists: List[PlaylistInfo]):
+        """Fetch the track IDs of every playlist concurrently"""
+        playlist_ids = [playlist.id for playlist in playlists]
+        if not playlist_ids:
+            return
+        
+        with ThreadPoolExecutor(max_workers=self.lexicon_workers) as executor:
+            track_lists = executor.map(self.lexicon_service.get_playlist_tracks, playlist_ids)
+            self._playlist_tracks.update(
+                (playlist_id, set(track_ids)) for playlist_id, track_ids in zip(playlist_ids, track_lists)
+            )
+    
+    def _playlist_track_ids(self, playlist_id: str) -> Set[str]:
+        """Return the IDs of the tracks in a playlist, fetching them on first use"""
+        track_ids = self._playlist_tracks.get(playlist_id)
+        if track_ids is None:
+            track_ids = set(self.lexicon_service.get_playlist_tracks(playlist_id))
+            self._playlist_tracks[playlist_id] = track_ids
+        return track_ids
+    
+    def _analyze_batch(self, tracks: List[TrackInfo]) -> Dict[str, GenreAnalysis]:
+        """Research and analyze a batch up front, keyed by track ID
+        
+        Tracks are researched concurrently, and going through
+        ``batch_analyze_tracks`` lets audio features be extracted in parallel
+        and the model predict the whole batch at once. Tracks that
+        are missing from the result are analyzed individually.
+        """
+        if not tracks:
+            return {}
+        
+        try:
+            research_results = self.music_research_service.research_tracks(tracks)
+            analyses = self.genre_detection_service.batch_analyze_tracks(tracks, research_results)
+        except Exception as e:
+            logger.warning(f"Batch analysis failed, analyzing tracks individually: {e}")
+            return {}
+        
+        return {analysis.track_id: analysis for analysis in analyses}
+    
+    def _has_confident_genre(self, track: TrackInfo) -> bool:
+        """Check whether a track already has a high-confidence genre"""
+        return bool(track.current_genre and track.confidence_score and track.confidence_score > 0.8)
+    
+    def _new_result(self, track: TrackInfo) -> Dict[str, Any]:
+        """Create the per-track result record"""
+        return {
             'track_id': track.id,
             'track_title': track.title,
             'track_artist': track.artist,
@@ -168,22 +361,34 @@ class MusicOrganizerService:
             'error': None,
             'analysis': None
         }
+    
+    def _skipped_result(self, track: TrackInfo) -> Dict[str, Any]:
+        """Create the result record for a track that needs no changes"""
+        result = self._new_result(track)
+        result['skipped'] = True
+        result['success'] = True
+        return result
+    
+    def _process_single_track(self, track: TrackInfo, playlists: List[PlaylistInfo], 
+                             dry_run: bool, analysis: Optional[GenreAnalysis] = None) -> Dict[str, Any]:
+        """Process a single track
+        
+        ``analysis`` is used as-is when the batch already produced one. Lexicon
+        writes are not sent here: the genre change and target playlists are
+        queued on the result under ``genre_update`` and ``playlist_targets``
+        for ``_apply_pending_writes``.
+        """
+        result = self._new_result(track)
         
         try:
-            # Skip if track already has a genre and confidence is high
-            if track.current_genre and track.confidence_score and track.confidence_score > 0.8:
-                result['skipped'] = True
-                result['success'] = True
-                logger.debug(f"Skipping {track.title} - already has high-confidence genre")
-                return result
-            
-            # Research the track
-            logger.debug(f"Researching track: {track.title}")
-            research_result = self.music_research_service.research_track(track)
-            
-            # Analyze genre
-            logger.debug(f"Analyzing genre for: {track.title}")
-            analysis = self.genre_detection_service.analyze_track(track, research_result)
+            if analysis is None:
+                # Research the track
+                logger.debug(f"Researching track: {track.title}")
+                research_result = self.music_research_service.research_track(track)
+                
+                # Analyze genre
+                logger.debug(f"Analyzing genre for: {track.title}")
+                analysis = self.genre_detection_service.analyze_track(track, research_result)
             result['analysis'] = analysis
             
             # Check if confidence is sufficient
@@ -193,42 +398,30 @@ class MusicOrganizerService:
                 result['success'] = True
                 return result
             
-            # Update track genre if different from current
+            # Queue a genre update if different from current
             if not dry_run and analysis.predicted_genre.value != track.current_genre:
                 logger.info(f"Updating genre for {track.title}: {track.current_genre} -> {analysis.predicted_genre.value}")
-                
-                success = self.lexicon_service.update_track_genre(track.id, analysis.predicted_genre.value)
-                if success:
-                    result['updated'] = True
-                else:
-                    logger.error(f"Failed to update genre for {track.title}")
-                    result['error'] = "Failed to update genre"
-                    return result
+                result['genre_update'] = analysis.predicted_genre.value
             
             # Match to playlists
             matched_playlists = self.playlist_matching_service.match_track_to_playlists(
                 track, analysis, playlists
             )
             
-            # Add to playlists
-            playlist_additions = 0
+            # Queue playlist additions
+            playlist_targets = []
             if not dry_run and matched_playlists:
                 for playlist_id in matched_playlists:
                     # Check if track is already in playlist
-                    existing_tracks = self.lexicon_service.get_playlist_tracks(playlist_id)
-                    if track.id not in existing_tracks:
-                        success = self.lexicon_service.add_track_to_playlist(playlist_id, track.id)
-                        if success:
-                            playlist_additions += 1
-                        else:
-                            logger.warning(f"Failed to add {track.title} to playlist {playlist_id}")
-            
-            result['playlist_additions'] = playlist_additions
+                    if track.id not in self._playlist_track_ids(playlist_id):
+                        playlist_targets.append(playlist_id)
+            
+            result['playlist_targets'] = playlist_targets
             result['matched_playlists'] = matched_playlists
             result['success'] = True
             
             logger.info(f"Processed {track.title}: Genre={analysis.predicted_genre.value}, "
-                       f"Confidence={analysis.confidence:.2f}, Playlists={playlist_additions}")
+                       f"Confidence={analysis.confidence:.2f}, Playlists={len(playlist_targets)}")
             
         except Exception as e:
             logger.error(f"Error processing track {track.title}: {e}")
@@ -245,27 +438,15 @@ class MusicOrganizerService:
             'errors': results['errors'],
             'skipped': results['skipped'],
             'success_rate': 0.0,
-            'genre_distribution': {},
-            'remix_analysis': {'total_remixes': 0, 'processed_remixes': 0}
+            # Aggregated while the batches were processed
+            'genre_distribution': dict(results['genre_distribution']),
+            'remix_analysis': dict(results['remix_analysis'])
         }
         
         # Calculate success rate
         if results['processed'] > 0:
             summary['success_rate'] = (results['processed'] - results['errors']) / results['processed']
         
-        # Analyze genre distribution
-        for detail in results['details']:
-            if detail.get('analysis'):
-                analysis = detail['analysis']
-                genre = analysis.predicted_genre.value
-                summary['genre_distribution'][genre] = summary['genre_distribution'].get(genre, 0) + 1
-                
-                # Count remixes
-                if analysis.is_remix:
-                    summary['remix_analysis']['total_remixes'] += 1
-                    if detail.get('success'):
-                        summary['remix_analysis']['processed_remixes'] += 1
-        
         return summary
     
     def analyze_collection(self) -> Dict[str, Any]:
@@ -281,18 +462,8 @@ class MusicOrganizerService:
             playlist_analysis = self.playlist_matching_service.analyze_playlist_consistency(playlists)
             
             # Analyze track genres
-            genre_distribution = {}
-            tracks_without_genre = 0
-            tracks_with_low_confidence = 0
-            
-            for track in tracks:
-                if not track.current_genre:
-                    tracks_without_genre += 1
-                else:
-                    genre_distribution[track.current_genre] = genre_distribution.get(track.current_genre, 0) + 1
-                
-                if track.confidence_score and track.confidence_score < self.confidence_threshold:
-                    tracks_with_low_confidence += 1
+            genre_distribution, tracks_without_genre, tracks_with_low_confidence = \
+                self._collection_genre_stats(tracks)
             
             analysis = {
                 'total_tracks': len(tracks),
@@ -323,6 +494,38 @@ class MusicOrganizerService:
             logger.error(f"Collection analysis failed: {e}")
             return {'error': str(e)}
     
+    def _collection_genre_stats(self, tracks: List[TrackInfo]) -> Tuple[Dict[str, int], int, int]:
+        """Return the genre distribution and counts of untagged and low-confidence tracks
+        
+        Large libraries are counted with pandas, so the per-track work is
+        only pulling out the two fields.
+        """
+        threshold = self.confidence_threshold
+        
+        if len(tracks) >= VECTORIZED_ANALYSIS_MIN_TRACKS:
+            genres = pd.Series([track.current_genre for track in tracks], dtype=object)
+            confidences = pd.Series([track.confidence_score for track in tracks], dtype=float)
+            
+            missing = genres.isna() | (genres == '')
+            genre_distribution = {genre: int(count) for genre, count in genres[~missing].value_counts().items()}
+            # NaN (no score) compares False, and a 0 score counts as unset
+            low_confidence = (confidences != 0) & (confidences < threshold)
+            return genre_distribution, int(missing.sum()), int(low_confidence.sum())
+        
+        # Count in one pass
+        genre_counts = Counter()
+        tracks_with_low_confidence = 0
+        
+        for track in tracks:
+            genre_counts[track.current_genre] += 1
+            confidence = track.confidence_score
+            if confidence and confidence < threshold:
+                tracks_with_low_confidence += 1
+        
+        # Missing genres (None or '') were counted under their falsy key
+        tracks_without_genre = genre_counts.pop(None, 0) + genre_counts.pop('', 0)
+        return dict(genre_counts), tracks_without_genre, tracks_with_low_confidence
+    
     def train_genre_model(self, training_data_path: str) -> bool:
         """Train the genre classification model with custom data"""
         logger.info("Training genre classification model...")
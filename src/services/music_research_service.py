@@ -1,41 +1,272 @@
+import asyncio
+import functools
+import hashlib
+import json
 import musicbrainzngs
+import numpy as np
+import os
 import requests
 import logging
 import re
-from typing import List, Dict, Any, Optional, Tuple
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import List, Dict, Any, Callable, FrozenSet, Optional, Tuple
 from ..models.track_models import TrackInfo, MusicResearchResult, Genre
 
 logger = logging.getLogger(__name__)
 
+LASTFM_API_URL = "http://ws.audioscrobbler.com/2.0/"
+
+# Search-string cleanup patterns, applied to lowercased text
+_FILE_EXTENSION_RE = re.compile(r'\.(mp3|wav|flac|aac|m4a)$')
+_LEADING_NUMBER_RE = re.compile(r'^\d+\s*[-.]?\s*')
+_TRAILING_NUMBER_RE = re.compile(r'\s*[-.]?\s*\d+\s*$')
+_ARTIST_ARTICLE_RE = re.compile(r'^(the|a|an)\s+')
+_WORD_RE = re.compile(r'\w+')
+
+
+@functools.lru_cache(maxsize=8192)
+def _clean_title(title: str) -> str:
+    """Lowercase a title and strip file extensions and track numbers"""
+    # Remove common suffixes and clean up
+    clean_title = title.lower()
+    
+    # Remove file extensions
+    clean_title = _FILE_EXTENSION_RE.sub('', clean_title)
+    
+    # Remove common prefixes/suffixes
+    clean_title = _LEADING_NUMBER_RE.sub('', clean_title)  # Remove track numbers
+    clean_title = _TRAILING_NUMBER_RE.sub('', clean_title)  # Remove trailing numbers
+    
+    return clean_title.strip()
+
+
+@functools.lru_cache(maxsize=8192)
+def _clean_artist(artist: str) -> str:
+    """Lowercase an artist name and strip a leading article"""
+    # Remove common prefixes
+    clean_artist = artist.lower()
+    clean_artist = _ARTIST_ARTICLE_RE.sub('', clean_artist)
+    
+    return clean_artist.strip()
+
+
+@functools.lru_cache(maxsize=8192)
+def _word_set(text: str) -> FrozenSet[str]:
+    """Whitespace-separated words of a (cleaned) string"""
+    return frozenset(text.split())
+
+
+def _lookup_cache_path(cache_dir: str, key: str) -> str:
+    """Build the cache file path for a lookup key"""
+    return os.path.join(cache_dir, f"{key}.json")
+
+
+def _load_cached_lookup(cache_dir: str, key: str, ttl: float) -> Optional[Any]:
+    """Return a cached lookup payload, or None if missing or older than ``ttl`` seconds"""
+    try:
+        cache_path = _lookup_cache_path(cache_dir, key)
+        if os.path.exists(cache_path) and time.time() - os.path.getmtime(cache_path) < ttl:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except Exception as e:
+        logger.debug(f"Lookup cache read failed for {key}: {e}")
+    
+    return None
+
+
+def _store_cached_lookup(cache_dir: str, key: str, payload: Any):
+    """Write a lookup payload to the cache"""
+    try:
+        cache_path = _lookup_cache_path(cache_dir, key)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        logger.debug(f"Failed to cache lookup {key}: {e}")
+
+
+class RateLimiter:
+    """Leaky-bucket limiter spacing calls at most ``rate`` per second
+    
+    Use as ``with limiter:`` around a request. Each caller reserves the next
+    free slot under a lock and sleeps until it comes up, so the limiter is
+    safe to share between the worker threads the lookups run in.
+    """
+    
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+    
+    def __enter__(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        
+        if wait > 0:
+            time.sleep(wait)
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+    
+    def pause(self, seconds: float):
+        """Hold back every caller for at least ``seconds`` (e.g. a Retry-After)"""
+        with self._lock:
+            self._next_slot = max(self._next_slot, time.monotonic() + seconds)
+
 
 class MusicResearchService:
     """Service for researching music tracks using various APIs (without Spotify)"""
     
-    def __init__(self, lastfm_api_key: str, musicbrainz_user_agent: str):
+    def __init__(self, lastfm_api_key: str, musicbrainz_user_agent: str, max_concurrency: int = 8,
+                 lastfm_rate_limit: float = 5.0, musicbrainz_rate_limit: float = 1.0,
+                 max_retries: int = 3, cache_dir: Optional[str] = None,
+                 cache_ttl: float = 30 * 24 * 3600, timeout: Tuple[float, float] = (3, 30),
+                 musicbrainz_search_limit: int = 5, memory_cache_size: int = 10000):
         self.lastfm_api_key = lastfm_api_key
         self.musicbrainz_user_agent = musicbrainz_user_agent
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.musicbrainz_search_limit = musicbrainz_search_limit
+        
+        # One keep-alive session for all Last.fm calls, pooled for the
+        # concurrent lookups. Throttling (429/503) is retried in _lastfm_get
+        # so it goes through the rate limiter; other transient errors here.
+        self.session = requests.Session()
+        self.session.headers.update({'Connection': 'keep-alive'})
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=4 * max_concurrency,
+            max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[500, 502, 504])
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
+        # Lookups keyed by cleaned artist/title: the most recent
+        # memory_cache_size in memory (LRU, so long runs stay bounded) and all
+        # of them on disk under cache_dir (if set) for later runs
+        self.cache_dir = cache_dir
+        self.cache_ttl = cache_ttl
+        self.memory_cache_size = memory_cache_size
+        self._lookup_cache: "OrderedDict[str, Any]" = OrderedDict()
+        self._lookup_cache_lock = threading.Lock()
+        
+        # Pace Last.fm requests; musicbrainzngs paces (and retries) its own
+        self._lastfm_limiter = RateLimiter(lastfm_rate_limit)
+        
+        # 1 for each recent Last.fm response that was throttled, else 0
+        self._recent_throttles = deque(maxlen=50)
         
         # Initialize MusicBrainz
         musicbrainzngs.set_useragent(musicbrainz_user_agent, "1.0", "https://github.com/genrebend-pro")
+        if musicbrainz_rate_limit > 0:
+            musicbrainzngs.set_rate_limit(1.0 / musicbrainz_rate_limit, 1)
+        else:
+            # 0 means unlimited, as for the Last.fm limiter
+            musicbrainzngs.set_rate_limit(False)
         
         # Remix detection keywords
         self.remix_keywords = [
             'remix', 'edit', 'version', 'mix', 'rework', 'reinterpretation',
-            'bootleg', 'mashup', 'flip', 'flip', 'refix', 'vip', 'dub',
+            'bootleg', 'mashup', 'flip', 'refix', 'vip', 'dub',
             'instrumental', 'acapella', 'extended', 'radio edit'
         ]
+        # Single-word keywords are matched against a string's word set, so the
+        # check costs O(words) however many keywords there are. Multi-word
+        # keywords ('radio edit') are matched as phrases.
+        casefolded = {keyword.casefold() for keyword in self.remix_keywords}
+        self._remix_words = frozenset(keyword for keyword in casefolded if ' ' not in keyword)
+        self._remix_phrases = tuple(f" {keyword} " for keyword in casefolded if ' ' in keyword)
+        
+        # Confidence is the dot product of these weights with the features
+        # from _confidence_features (two sources, one source, genres found,
+        # Last.fm artist info, similar tracks, play count). Kept on the
+        # instance so they can be replaced, e.g. by fitted ones.
+        self.confidence_weights = np.array([0.8, 0.6, 0.1, 0.05, 0.05, 0.05])
     
     def research_track(self, track: TrackInfo) -> MusicResearchResult:
         """Research a track using all available APIs"""
+        return self.research_tracks([track])[0]
+    
+    def research_tracks(self, tracks: List[TrackInfo]) -> List[MusicResearchResult]:
+        """Research several tracks concurrently, returning results in input order
+        
+        Up to ``max_concurrency`` tracks are researched at once, and each one
+        sends its Last.fm and MusicBrainz lookups in parallel, so a batch
+        costs roughly the slowest lookups rather than the sum of all of them.
+        """
+        if not tracks:
+            return []
+        
+        return asyncio.run(self._research_all(tracks))
+    
+    async def _research_all(self, tracks: List[TrackInfo]) -> List[MusicResearchResult]:
+        """Run ``research_track_async`` for every track under a semaphore"""
+        # The HTTP clients block, so the lookups run in worker threads: one
+        # per in-flight request (three Last.fm calls plus MusicBrainz)
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=4 * self.max_concurrency)
+        )
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def bounded(track: TrackInfo) -> MusicResearchResult:
+            async with semaphore:
+                return await self.research_track_async(track)
+        
+        return await asyncio.gather(*(bounded(track) for track in tracks))
+    
+    async def research_track_async(self, track: TrackInfo) -> MusicResearchResult:
+        """Research a track, running the API lookups concurrently"""
         result = MusicResearchResult(track_id=track.id)
         
-        # Search Last.fm
-        lastfm_data = self._search_lastfm(track)
+        clean_title = self._clean_title_for_search(track.title)
+        clean_artist = self._clean_artist_for_search(track.artist)
+        
+        # run_in_executor rather than asyncio.to_thread, which needs Python 3.9
+        loop = asyncio.get_running_loop()
+        
+        def run(func, *args):
+            return loop.run_in_executor(None, functools.partial(func, *args))
+        
+        async def search_lastfm():
+            # artist.getInfo and track.getSimilar are only sent once
+            # track.getInfo has found the track, as in _search_lastfm.
+            # Misses then cost one rate-limited call instead of three.
+            track_data = await run(self._get_lastfm_track_info, track, clean_artist, clean_title)
+            if not track_data:
+                return None
+            
+            artist_data, similar_tracks = await asyncio.gather(
+                run(self._get_lastfm_artist_info, clean_artist),
+                run(self._get_lastfm_similar_tracks, clean_artist, clean_title)
+            )
+            return self._merge_lastfm_data(track_data, artist_data, similar_tracks)
+        
+        # MusicBrainz doesn't depend on Last.fm, so it runs alongside
+        lastfm_data, musicbrainz_data = await asyncio.gather(
+            search_lastfm(),
+            run(self._search_musicbrainz, track)
+        )
+        
+        return self._build_result(result, track, lastfm_data, musicbrainz_data)
+    
+    def _build_result(self, result: MusicResearchResult, track: TrackInfo,
+                      lastfm_data: Optional[Dict[str, Any]],
+                      musicbrainz_data: Optional[Dict[str, Any]]) -> MusicResearchResult:
+        """Fill in a research result from the Last.fm and MusicBrainz data"""
         if lastfm_data:
             result.lastfm_data = lastfm_data
         
-        # Search MusicBrainz
-        musicbrainz_data = self._search_musicbrainz(track)
         if musicbrainz_data:
             result.musicbrainz_data = musicbrainz_data
         
@@ -52,39 +283,114 @@ class MusicResearchService:
     
     def _search_lastfm(self, track: TrackInfo) -> Optional[Dict[str, Any]]:
         """Search for track on Last.fm with enhanced metadata"""
-        try:
-            # Clean track info for Last.fm search
-            clean_title = self._clean_title_for_search(track.title)
-            clean_artist = self._clean_artist_for_search(track.artist)
+        # Clean track info for Last.fm search
+        clean_title = self._clean_title_for_search(track.title)
+        clean_artist = self._clean_artist_for_search(track.artist)
+        
+        track_data = self._get_lastfm_track_info(track, clean_artist, clean_title)
+        if not track_data:
+            return None
+        
+        return self._merge_lastfm_data(
+            track_data,
+            self._get_lastfm_artist_info(clean_artist),
+            self._get_lastfm_similar_tracks(clean_artist, clean_title)
+        )
+    
+    def _merge_lastfm_data(self, track_data: Optional[Dict[str, Any]],
+                           artist_data: Optional[Dict[str, Any]],
+                           similar_tracks: Optional[List[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """Attach artist info and similar tracks to Last.fm track data"""
+        if not track_data:
+            return None
+        
+        # Copy so cached lookups are never modified
+        track_data = dict(track_data)
+        
+        # Additional artist info for more metadata
+        if artist_data:
+            track_data['artist_info'] = artist_data
+        
+        # Similar tracks for genre analysis
+        if similar_tracks:
+            track_data['similar_tracks'] = similar_tracks
+        
+        return track_data
+    
+    def _cached_lookup(self, method: str, key_parts: Tuple[str, ...],
+                       fetch: Callable[[], Optional[Any]]) -> Optional[Any]:
+        """Return a lookup from the memory or disk cache, calling ``fetch`` on a miss
+        
+        Only found results are cached, so failed or empty lookups are retried
+        on the next run.
+        """
+        key = hashlib.sha1('|'.join((method,) + key_parts).encode()).hexdigest()
+        
+        with self._lookup_cache_lock:
+            if key in self._lookup_cache:
+                self._lookup_cache.move_to_end(key)
+                return self._lookup_cache[key]
+        
+        payload = _load_cached_lookup(self.cache_dir, key, self.cache_ttl) if self.cache_dir else None
+        if payload is None:
+            payload = fetch()
+            if payload is not None and self.cache_dir:
+                _store_cached_lookup(self.cache_dir, key, payload)
+        
+        if payload is not None:
+            with self._lookup_cache_lock:
+                self._lookup_cache[key] = payload
+                self._lookup_cache.move_to_end(key)
+                while len(self._lookup_cache) > self.memory_cache_size:
+                    self._lookup_cache.popitem(last=False)
+        
+        return payload
+    
+    def _lastfm_get(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Make a rate-limited Last.fm request, backing off on 429/503"""
+        for attempt in range(self.max_retries + 1):
+            with self._lastfm_limiter:
+                response = self.session.get(LASTFM_API_URL, params=params, timeout=self.timeout)
+            
+            throttled = response.status_code in (429, 503)
+            self._recent_throttles.append(int(throttled))
+            if not throttled or attempt == self.max_retries:
+                break
             
-            # Search for track info
-            url = "http://ws.audioscrobbler.com/2.0/"
+            # Back off through the limiter so concurrent lookups wait too
+            retry_after = response.headers.get('Retry-After', '')
+            delay = float(retry_after) if retry_after.isdigit() else 2 ** attempt
+            logger.debug(f"Last.fm returned {response.status_code}, retrying in {delay}s")
+            self._lastfm_limiter.pause(delay)
+        
+        response.raise_for_status()
+        return response.json()
+    
+    def throttle_ratio(self) -> float:
+        """Fraction of recent Last.fm responses that were throttled (429/503)"""
+        recent = list(self._recent_throttles)
+        return sum(recent) / len(recent) if recent else 0.0
+    
+    def _get_lastfm_track_info(self, track: TrackInfo, artist: str, title: str) -> Optional[Dict[str, Any]]:
+        """Get track information from Last.fm"""
+        return self._cached_lookup('track.getInfo', (artist, title),
+                                   lambda: self._fetch_lastfm_track_info(track, artist, title))
+    
+    def _fetch_lastfm_track_info(self, track: TrackInfo, artist: str, title: str) -> Optional[Dict[str, Any]]:
+        """Request track information from Last.fm"""
+        try:
             params = {
                 'method': 'track.getInfo',
                 'api_key': self.lastfm_api_key,
-                'artist': clean_artist,
-                'track': clean_title,
+                'artist': artist,
+                'track': title,
                 'format': 'json'
             }
             
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
+            data = self._lastfm_get(params)
             
             if 'track' in data and data['track'].get('name'):
-                track_data = data['track']
-                
-                # Get additional artist info for more metadata
-                artist_data = self._get_lastfm_artist_info(clean_artist)
-                if artist_data:
-                    track_data['artist_info'] = artist_data
-                
-                # Get similar tracks for genre analysis
-                similar_tracks = self._get_lastfm_similar_tracks(clean_artist, clean_title)
-                if similar_tracks:
-                    track_data['similar_tracks'] = similar_tracks
-                
-                return track_data
+                return data['track']
         
         except Exception as e:
             logger.error(f"Last.fm search failed for {track.title}: {e}")
@@ -93,8 +399,12 @@ class MusicResearchService:
     
     def _get_lastfm_artist_info(self, artist: str) -> Optional[Dict[str, Any]]:
         """Get additional artist information from Last.fm"""
+        return self._cached_lookup('artist.getInfo', (artist,),
+                                   lambda: self._fetch_lastfm_artist_info(artist))
+    
+    def _fetch_lastfm_artist_info(self, artist: str) -> Optional[Dict[str, Any]]:
+        """Request artist information from Last.fm"""
         try:
-            url = "http://ws.audioscrobbler.com/2.0/"
             params = {
                 'method': 'artist.getInfo',
                 'api_key': self.lastfm_api_key,
@@ -102,9 +412,7 @@ class MusicResearchService:
                 'format': 'json'
             }
             
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
+            data = self._lastfm_get(params)
             
             if 'artist' in data:
                 return data['artist']
@@ -116,8 +424,12 @@ class MusicResearchService:
     
     def _get_lastfm_similar_tracks(self, artist: str, track: str) -> Optional[List[Dict[str, Any]]]:
         """Get similar tracks from Last.fm for genre analysis"""
+        return self._cached_lookup('track.getSimilar', (artist, track),
+                                   lambda: self._fetch_lastfm_similar_tracks(artist, track))
+    
+    def _fetch_lastfm_similar_tracks(self, artist: str, track: str) -> Optional[List[Dict[str, Any]]]:
+        """Request similar tracks from Last.fm"""
         try:
-            url = "http://ws.audioscrobbler.com/2.0/"
             params = {
                 'method': 'track.getSimilar',
                 'api_key': self.lastfm_api_key,
@@ -126,9 +438,7 @@ class MusicResearchService:
                 'format': 'json'
             }
             
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
+            data = self._lastfm_get(params)
             
             if 'similartracks' in data and 'track' in data['similartracks']:
                 return data['similartracks']['track'][:5]  # Limit to 5 similar tracks
@@ -140,16 +450,24 @@ class MusicResearchService:
     
     def _search_musicbrainz(self, track: TrackInfo) -> Optional[Dict[str, Any]]:
         """Search for track on MusicBrainz"""
+        # Clean track info
+        clean_title = self._clean_title_for_search(track.title)
+        clean_artist = self._clean_artist_for_search(track.artist)
+        
+        # The best match only depends on the cleaned artist and title
+        return self._cached_lookup('recording.search',
+                                   (clean_artist, clean_title, str(self.musicbrainz_search_limit)),
+                                   lambda: self._fetch_musicbrainz_match(track, clean_artist, clean_title))
+    
+    def _fetch_musicbrainz_match(self, track: TrackInfo, clean_artist: str,
+                                 clean_title: str) -> Optional[Dict[str, Any]]:
+        """Search MusicBrainz recordings and pick the best match"""
         try:
-            # Clean track info
-            clean_title = self._clean_title_for_search(track.title)
-            clean_artist = self._clean_artist_for_search(track.artist)
-            
             # Search for recordings
             results = musicbrainzngs.search_recordings(
                 recording=clean_title,
                 artist=clean_artist,
-                limit=5
+                limit=self.musicbrainz_search_limit
             )
             
             if results['recording-list']:
@@ -166,175 +484,123 @@ class MusicResearchService:
     def _detect_remix(self, track: TrackInfo, lastfm_data: Optional[Dict], 
                      musicbrainz_data: Optional[Dict]) -> bool:
         """Detect if a track is a remix"""
-        # Check track title for remix keywords
-        title_lower = track.title.lower()
-        for keyword in self.remix_keywords:
-            if keyword in title_lower:
-                return True
-        
-        # Check artist name for remix indicators
-        artist_lower = track.artist.lower()
-        for keyword in self.remix_keywords:
-            if keyword in artist_lower:
-                return True
-        
-        # Check Last.fm data
+        # Track title and artist, then the Last.fm and MusicBrainz names
+        candidates = [track.title, track.artist]
+        
         if lastfm_data:
-            lastfm_title = lastfm_data.get('name', '').lower()
-            lastfm_artist = lastfm_data.get('artist', {}).get('name', '').lower()
-            
-            for keyword in self.remix_keywords:
-                if keyword in lastfm_title or keyword in lastfm_artist:
-                    return True
+            candidates.append(lastfm_data.get('name', ''))
+            candidates.append(lastfm_data.get('artist', {}).get('name', ''))
         
-        # Check MusicBrainz data
         if musicbrainz_data:
-            mb_title = musicbrainz_data.get('title', '').lower()
-            mb_artist = musicbrainz_data.get('artist-credit-phrase', '').lower()
-            
-            for keyword in self.remix_keywords:
-                if keyword in mb_title or keyword in mb_artist:
-                    return True
+            candidates.append(musicbrainz_data.get('title', ''))
+            candidates.append(musicbrainz_data.get('artist-credit-phrase', ''))
+        
+        return any(text and self._has_remix_keyword(text) for text in candidates)
+    
+    def _has_remix_keyword(self, text: str) -> bool:
+        """Check a title or artist for a remix keyword as a whole word or phrase"""
+        words = _WORD_RE.findall(text.casefold())
+        if not self._remix_words.isdisjoint(words):
+            return True
+        
+        if self._remix_phrases:
+            joined = f" {' '.join(words)} "
+            return any(phrase in joined for phrase in self._remix_phrases)
         
         return False
     
     def _combine_genres(self, lastfm_data: Optional[Dict], 
                        musicbrainz_data: Optional[Dict]) -> List[str]:
         """Combine genre information from all sources"""
-        genres = set()
+        tag_nodes = []
         
-        # Extract genres from Last.fm
+        # Tags from the Last.fm track, its artist info and similar tracks
         if lastfm_data:
-            # Get tags from track
-            lastfm_tags = lastfm_data.get('toptags', {}).get('tag', [])
-            if isinstance(lastfm_tags, list):
-                for tag in lastfm_tags:
-                    if isinstance(tag, dict) and 'name' in tag:
-                        genres.add(tag['name'])
-            elif isinstance(lastfm_tags, dict) and 'name' in lastfm_tags:
-                genres.add(lastfm_tags['name'])
-            
-            # Get tags from artist info
-            artist_info = lastfm_data.get('artist_info', {})
-            if artist_info:
-                artist_tags = artist_info.get('tags', {}).get('tag', [])
-                if isinstance(artist_tags, list):
-                    for tag in artist_tags:
-                        if isinstance(tag, dict) and 'name' in tag:
-                            genres.add(tag['name'])
-                elif isinstance(artist_tags, dict) and 'name' in artist_tags:
-                    genres.add(artist_tags['name'])
-            
-            # Extract genres from similar tracks
-            similar_tracks = lastfm_data.get('similar_tracks', [])
-            for similar_track in similar_tracks:
-                similar_tags = similar_track.get('toptags', {}).get('tag', [])
-                if isinstance(similar_tags, list):
-                    for tag in similar_tags:
-                        if isinstance(tag, dict) and 'name' in tag:
-                            genres.add(tag['name'])
-                elif isinstance(similar_tags, dict) and 'name' in similar_tags:
-                    genres.add(similar_tags['name'])
-        
-        # Extract genres from MusicBrainz
+            tag_nodes.append(lastfm_data.get('toptags', {}).get('tag'))
+            tag_nodes.append((lastfm_data.get('artist_info') or {}).get('tags', {}).get('tag'))
+            for similar_track in lastfm_data.get('similar_tracks', []):
+                tag_nodes.append(similar_track.get('toptags', {}).get('tag'))
+        
+        # Tags from MusicBrainz
         if musicbrainz_data:
-            musicbrainz_tags = musicbrainz_data.get('tag-list', [])
-            if isinstance(musicbrainz_tags, list):
-                for tag in musicbrainz_tags:
-                    if isinstance(tag, dict) and 'name' in tag:
-                        genres.add(tag['name'])
-            elif isinstance(musicbrainz_tags, dict) and 'name' in musicbrainz_tags:
-                genres.add(musicbrainz_tags['name'])
+            tag_nodes.append(musicbrainz_data.get('tag-list'))
+        
+        # Case-insensitive dedupe, keeping the first spelling seen
+        genres = {}
+        for node in tag_nodes:
+            for name in self._extract_tag_names(node):
+                genres.setdefault(name.casefold(), name)
         
-        return list(genres)
+        return list(genres.values())
+    
+    def _extract_tag_names(self, tags: Any) -> List[str]:
+        """Return the tag names from a tag list, a single tag dict or nothing"""
+        if not tags:
+            return []
+        if isinstance(tags, dict):
+            tags = [tags]
+        elif not isinstance(tags, list):
+            return []
+        
+        return [tag['name'] for tag in tags if isinstance(tag, dict) and 'name' in tag]
     
     def _calculate_confidence(self, result: MusicResearchResult) -> float:
         """Calculate confidence score for the research result"""
-        confidence = 0.0
-        
-        # Base confidence from number of sources
-        sources_found = 0
-        if result.lastfm_data:
-            sources_found += 1
-        if result.musicbrainz_data:
-            sources_found += 1
-        
-        # Confidence based on sources found
-        if sources_found == 2:
-            confidence = 0.8
-        elif sources_found == 1:
-            confidence = 0.6
-        
-        # Boost confidence if genres are consistent across sources
-        if result.combined_genres and len(result.combined_genres) > 0:
-            confidence += 0.1
-        
-        # Boost confidence if Last.fm has rich data
-        if result.lastfm_data:
-            # Check for artist info
-            if result.lastfm_data.get('artist_info'):
-                confidence += 0.05
-            
-            # Check for similar tracks
-            if result.lastfm_data.get('similar_tracks'):
-                confidence += 0.05
-            
-            # Check for play count (popularity indicator)
-            if result.lastfm_data.get('playcount'):
-                confidence += 0.05
-        
+        confidence = float(self._confidence_features(result) @ self.confidence_weights)
         return min(confidence, 1.0)
     
+    @staticmethod
+    def _confidence_features(result: MusicResearchResult) -> np.ndarray:
+        """Feature vector matching ``confidence_weights``"""
+        sources_found = bool(result.lastfm_data) + bool(result.musicbrainz_data)
+        lastfm_data = result.lastfm_data or {}
+        return np.array([
+            sources_found == 2,
+            sources_found == 1,
+            bool(result.combined_genres),
+            bool(lastfm_data.get('artist_info')),
+            bool(lastfm_data.get('similar_tracks')),
+            bool(lastfm_data.get('playcount')),
+        ], dtype=float)
+    
     def _clean_title_for_search(self, title: str) -> str:
         """Clean track title for better search results"""
-        # Remove common suffixes and clean up
-        clean_title = title.lower()
-        
-        # Remove file extensions
-        clean_title = re.sub(r'\.(mp3|wav|flac|aac|m4a)$', '', clean_title)
-        
-        # Remove common prefixes/suffixes
-        clean_title = re.sub(r'^\d+\s*[-.]?\s*', '', clean_title)  # Remove track numbers
-        clean_title = re.sub(r'\s*[-.]?\s*\d+\s*$', '', clean_title)  # Remove trailing numbers
-        
-        return clean_title.strip()
+        # Memoized: each title is cleaned for the Last.fm, MusicBrainz and matching paths
+        return _clean_title(title)
     
     def _clean_artist_for_search(self, artist: str) -> str:
         """Clean artist name for better search results"""
-        # Remove common prefixes
-        clean_artist = artist.lower()
-        clean_artist = re.sub(r'^(the|a|an)\s+', '', clean_artist)
-        
-        return clean_artist.strip()
+        return _clean_artist(artist)
     
     def _find_best_musicbrainz_match(self, track: TrackInfo, musicbrainz_tracks: List[Dict]) -> Optional[Dict]:
         """Find the best matching track from MusicBrainz results"""
         if not musicbrainz_tracks:
             return None
         
-        # Similar logic to Spotify matching
-        clean_title = self._clean_title_for_search(track.title)
-        clean_artist = self._clean_artist_for_search(track.artist)
+        # Tokenize the query once rather than for every candidate
+        title_words = _word_set(self._clean_title_for_search(track.title))
+        artist_words = _word_set(self._clean_artist_for_search(track.artist))
         
-        best_match = None
-        best_score = 0
+        count = len(musicbrainz_tracks)
+        title_similarity = np.zeros(count)
+        artist_similarity = np.zeros(count)
         
-        for mb_track in musicbrainz_tracks:
+        for i, mb_track in enumerate(musicbrainz_tracks):
             mb_title = self._clean_title_for_search(mb_track.get('title', ''))
-            mb_artist = self._clean_artist_for_search(
-                mb_track.get('artist-credit-phrase', '')
-            )
+            mb_artist = self._clean_artist_for_search(mb_track.get('artist-credit-phrase', ''))
+            title_similarity[i] = self._jaccard(title_words, _word_set(mb_title))
+            artist_similarity[i] = self._jaccard(artist_words, _word_set(mb_artist))
             
-            title_similarity = self._calculate_similarity(clean_title, mb_title)
-            artist_similarity = self._calculate_similarity(clean_artist, mb_artist)
-            
-            score = (title_similarity * 0.4) + (artist_similarity * 0.6)
-            
-            if score > best_score:
-                best_score = score
-                best_match = mb_track
+            # Nothing beats a perfect match, and MusicBrainz lists its most
+            # relevant results first, so stop scoring here
+            if title_similarity[i] == 1.0 and artist_similarity[i] == 1.0:
+                return mb_track
+        
+        # Weight and pick the best of all candidates at once
+        scores = (title_similarity * 0.4) + (artist_similarity * 0.6)
+        best_index = int(scores.argmax())
         
-        return best_match if best_score > 0.6 else None
+        return musicbrainz_tracks[best_index] if scores[best_index] > 0.6 else None
     
     def _calculate_similarity(self, str1: str, str2: str) -> float:
         """Calculate string similarity using simple character overlap"""
@@ -342,13 +608,14 @@ class MusicResearchService:
             return 0.0
         
         # Convert to sets of words for better matching
-        words1 = set(str1.split())
-        words2 = set(str2.split())
-        
+        return self._jaccard(_word_set(str1), _word_set(str2))
+    
+    @staticmethod
+    def _jaccard(words1: FrozenSet[str], words2: FrozenSet[str]) -> float:
+        """Jaccard similarity of two word sets (0.0 if either is empty)"""
         if not words1 or not words2:
             return 0.0
         
-        intersection = words1.intersection(words2)
-        union = words1.union(words2)
-        
-        return len(intersection) / len(union) if union else 0.0
+        # |A | B| = |A| + |B| - |A & B|, without building the union
+        common = len(words1 & words2)
+        return common / (len(words1) + len(words2) - common)
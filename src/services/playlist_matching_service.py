@@ -1,171 +1,257 @@
+import functools
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+import re
+from collections import Counter
+from typing import List, Dict, Any, FrozenSet, Iterator, NamedTuple, Optional, Set, Tuple
 from ..models.track_models import TrackInfo, PlaylistInfo, GenreAnalysis, Genre
 
 logger = logging.getLogger(__name__)
 
+# Common spellings of a genre, mapped to the name they are compared as
+_GENRE_VARIATIONS = {
+    'drum and bass': 'drum & bass',
+    'dnb': 'drum & bass',
+    'd&b': 'drum & bass',
+    'progressive house': 'progressive',
+    'progressive trance': 'progressive',
+    'deep house': 'house',
+    'future bass': 'bass',
+    'trap': 'hip hop'
+}
+
+# Genres a collection is expected to have playlists for, in report order
+_COMMON_GENRES = ('house', 'techno', 'trance', 'dubstep', 'drum & bass', 'ambient')
+
+# Any of the remix keywords, scanned for in a casefolded playlist name in one pass
+_REMIX_PLAYLIST_RE = re.compile(r'remix|edit|version|mix|rework')
+
+
+@functools.lru_cache(maxsize=1024)
+def _normalize_genre_name(genre_name: str) -> str:
+    """Casefold a genre name and map common variations to one spelling"""
+    if not genre_name:
+        return ""
+    
+    # Strip before casefolding so only the trimmed string is folded, and
+    # casefold like the playlist names it is compared against
+    normalized = genre_name.strip().casefold()
+    
+    return _GENRE_VARIATIONS.get(normalized, normalized)
+
+
+# Normalized name of every Genre member, worked out once at import
+_GENRE_NORMALIZED: Dict[Genre, str] = {genre: _normalize_genre_name(genre.value) for genre in Genre}
+
+
+class _PlaylistFields(NamedTuple):
+    """The playlist fields the matchers compare, as parallel tuples, plus
+    genre -> playlist id indexes over them"""
+    ids: Tuple[str, ...]
+    genres: Tuple[str, ...]  # normalized playlist.genre
+    names: Tuple[str, ...]  # casefolded playlist.name
+    genre_in_name: Tuple[bool, ...]  # playlist has a genre tag and its name contains it
+    by_genre: Dict[str, FrozenSet[str]]  # normalized genre -> playlist ids
+    by_name: Dict[str, FrozenSet[str]]  # text -> ids of playlists whose name contains it, filled on first use
+    remix_ids: FrozenSet[str]  # playlists with a remix keyword in their name
+    matches: Dict[Tuple[Genre, bool], Tuple[str, ...]]  # (predicted genre, is remix) -> matched ids, filled on first use
+
 
 class PlaylistMatchingService:
     """Service for matching tracks to appropriate playlists based on genre"""
     
+    # Similar genres for better matching
+    _SIMILARITY_MATRIX: Dict[Genre, Tuple[Genre, ...]] = {
+        Genre.HOUSE: (Genre.DEEP_HOUSE, Genre.PROGRESSIVE, Genre.TECHNO),
+        Genre.DEEP_HOUSE: (Genre.HOUSE, Genre.AMBIENT, Genre.DOWNTEMPO),
+        Genre.TECHNO: (Genre.HOUSE, Genre.INDUSTRIAL, Genre.EXPERIMENTAL),
+        Genre.TRANCE: (Genre.PROGRESSIVE, Genre.AMBIENT, Genre.ELECTRONIC),
+        Genre.DUBSTEP: (Genre.DRUM_AND_BASS, Genre.TRAP, Genre.FUTURE_BASS),
+        Genre.DRUM_AND_BASS: (Genre.DUBSTEP, Genre.BREAKBEAT, Genre.TECHNO),
+        Genre.BREAKBEAT: (Genre.DRUM_AND_BASS, Genre.TECHNO, Genre.EXPERIMENTAL),
+        Genre.AMBIENT: (Genre.DOWNTEMPO, Genre.DEEP_HOUSE, Genre.EXPERIMENTAL),
+        Genre.DOWNTEMPO: (Genre.AMBIENT, Genre.DEEP_HOUSE, Genre.CHILLOUT),
+        Genre.PROGRESSIVE: (Genre.TRANCE, Genre.HOUSE, Genre.ELECTRONIC),
+        Genre.FUTURE_BASS: (Genre.DUBSTEP, Genre.TRAP, Genre.ELECTRONIC),
+        Genre.TRAP: (Genre.HIP_HOP, Genre.DUBSTEP, Genre.FUTURE_BASS),
+        Genre.ELECTRONIC: (Genre.TECHNO, Genre.TRANCE, Genre.PROGRESSIVE),
+        Genre.EXPERIMENTAL: (Genre.AMBIENT, Genre.TECHNO, Genre.BREAKBEAT)
+    }
+    
+    # Sub-genre playlists to suggest for a genre
+    _SUB_GENRE_SUGGESTIONS: Dict[Genre, Tuple[str, ...]] = {
+        Genre.HOUSE: ("Deep House", "Progressive House", "Tech House"),
+        Genre.TECHNO: ("Dark Techno", "Industrial Techno", "Minimal Techno"),
+        Genre.TRANCE: ("Uplifting Trance", "Progressive Trance", "Psy Trance"),
+        Genre.DUBSTEP: ("Brostep", "Chillstep", "Future Bass"),
+        Genre.DRUM_AND_BASS: ("Liquid DnB", "Neurofunk", "Jump Up")
+    }
+    
     def __init__(self):
         self.playlist_genre_mapping = {}
-        self.genre_similarity_matrix = self._build_genre_similarity_matrix()
+        self.genre_similarity_matrix = self._SIMILARITY_MATRIX
+        # (key, fields) for the last playlists seen, see _prepare_playlists
+        self._prepared: Optional[Tuple[Tuple[Tuple[str, str, str], ...], _PlaylistFields]] = None
     
     def match_track_to_playlists(self, track: TrackInfo, analysis: GenreAnalysis, 
                                available_playlists: List[PlaylistInfo]) -> List[str]:
-        """Match a track to appropriate playlists based on genre analysis"""
-        matched_playlists = []
+        """Match a track to appropriate playlists based on genre analysis
+        
+        The matches only depend on the predicted genre and whether the track
+        is a remix, so across a batch they're worked out once per such pair
+        and playlist list. They come back in playlist order.
+        """
+        fields = self._prepare_playlists(available_playlists)
+        key = (analysis.predicted_genre, analysis.is_remix)
+        cached = fields.matches.get(key)
+        if cached is not None:
+            return list(cached)
+        
+        # A set, so ids found by several finders are only kept once
+        matched_playlists: Set[str] = set()
         
         # Direct genre matches
-        direct_matches = self._find_direct_genre_matches(analysis.predicted_genre, available_playlists)
-        matched_playlists.extend(direct_matches)
+        matched_playlists.update(self._find_direct_genre_matches(analysis.predicted_genre, available_playlists))
         
         # Similar genre matches
-        similar_matches = self._find_similar_genre_matches(analysis.predicted_genre, available_playlists)
-        matched_playlists.extend(similar_matches)
+        matched_playlists.update(self._find_similar_genre_matches(analysis.predicted_genre, available_playlists))
         
         # Remix-specific matching
         if analysis.is_remix:
-            remix_matches = self._find_remix_specific_matches(track, analysis, available_playlists)
-            matched_playlists.extend(remix_matches)
+            matched_playlists.update(self._find_remix_specific_matches(track, analysis, available_playlists))
         
-        # Remove duplicates and return
-        return list(set(matched_playlists))
+        # Order by playlist position rather than by hash, so runs are repeatable
+        ordered = tuple(dict.fromkeys(
+            playlist_id for playlist_id in fields.ids if playlist_id in matched_playlists
+        ))
+        fields.matches[key] = ordered
+        return list(ordered)
     
-    def _find_direct_genre_matches(self, genre: Genre, playlists: List[PlaylistInfo]) -> List[str]:
-        """Find playlists that directly match the predicted genre"""
-        matches = []
+    def _prepare_playlists(self, playlists: List[PlaylistInfo]) -> _PlaylistFields:
+        """Normalize the playlist fields once per set of playlists
         
-        for playlist in playlists:
-            playlist_genre = self._normalize_genre_name(playlist.genre)
-            predicted_genre_name = self._normalize_genre_name(genre.value)
-            
-            # Direct match
-            if playlist_genre == predicted_genre_name:
-                matches.append(playlist.id)
-            
-            # Check if playlist name contains the genre
-            playlist_name_lower = playlist.name.lower()
-            if predicted_genre_name in playlist_name_lower:
-                matches.append(playlist.id)
+        The organizer passes the same playlists for every track of a run. The
+        fields are keyed on each playlist's id, name and genre, not on the
+        list object, so they are rebuilt whenever any of those change,
+        including edits made in place.
+        """
+        key = tuple((playlist.id, playlist.name, playlist.genre) for playlist in playlists)
+        if self._prepared is not None:
+            prepared_key, fields = self._prepared
+            if prepared_key == key:
+                return fields
+        
+        ids = tuple(playlist.id for playlist in playlists)
+        # One map over the memoized normalizer; playlists share a few genre tags
+        genres = tuple(map(_normalize_genre_name, [playlist.genre for playlist in playlists]))
+        
+        by_genre: Dict[str, set] = {}
+        for playlist_id, playlist_genre in zip(ids, genres):
+            by_genre.setdefault(playlist_genre, set()).add(playlist_id)
         
-        return matches
+        names = tuple(playlist.name.casefold() for playlist in playlists)
+        
+        fields = _PlaylistFields(
+            ids=ids,
+            genres=genres,
+            names=names,
+            genre_in_name=tuple(
+                bool(playlist_genre) and playlist_genre in playlist_name_lower
+                for playlist_genre, playlist_name_lower in zip(genres, names)
+            ),
+            by_genre={genre: frozenset(genre_ids) for genre, genre_ids in by_genre.items()},
+            by_name={},
+            matches={},
+            remix_ids=frozenset(
+                playlist_id for playlist_id, playlist_name_lower in zip(ids, names)
+                if _REMIX_PLAYLIST_RE.search(playlist_name_lower)
+            )
+        )
+        self._prepared = (key, fields)
+        return fields
     
-    def _find_similar_genre_matches(self, genre: Genre, playlists: List[PlaylistInfo]) -> List[str]:
-        """Find playlists with similar genres"""
-        matches = []
+    @staticmethod
+    def _playlists_named_with(fields: _PlaylistFields, text: str) -> FrozenSet[str]:
+        """Ids of playlists whose casefolded name contains ``text``
+        
+        Only the handful of genre and sub-genre names the matchers ask for
+        ever need a scan of the names, once each per playlist list.
+        """
+        named = fields.by_name.get(text)
+        if named is None:
+            named = frozenset(
+                playlist_id for playlist_id, playlist_name_lower in zip(fields.ids, fields.names)
+                if text in playlist_name_lower
+            )
+            fields.by_name[text] = named
         
+        return named
+    
+    def _playlists_for_genre(self, fields: _PlaylistFields, genre_name: str) -> FrozenSet[str]:
+        """Ids of playlists tagged with ``genre_name`` or named after it"""
+        tagged = fields.by_genre.get(genre_name)
+        named = self._playlists_named_with(fields, genre_name)
+        
+        # No new set when one side is empty
+        if not tagged:
+            return named
+        if not named:
+            return tagged
+        return tagged | named
+    
+    def _find_direct_genre_matches(self, genre: Genre, playlists: List[PlaylistInfo]) -> Iterator[str]:
+        """Find playlists that directly match the predicted genre"""
+        fields = self._prepare_playlists(playlists)
+        predicted_genre_name = _GENRE_NORMALIZED[genre]
+        
+        # Playlists tagged with the genre or with it in their name
+        yield from self._playlists_for_genre(fields, predicted_genre_name)
+    
+    def _find_similar_genre_matches(self, genre: Genre, playlists: List[PlaylistInfo]) -> Iterator[str]:
+        """Find playlists with similar genres"""
         # Get similar genres
-        similar_genres = self.genre_similarity_matrix.get(genre, [])
-        
-        for similar_genre in similar_genres:
-            for playlist in playlists:
-                playlist_genre = self._normalize_genre_name(playlist.genre)
-                similar_genre_name = self._normalize_genre_name(similar_genre.value)
-                
-                if playlist_genre == similar_genre_name:
-                    matches.append(playlist.id)
-                
-                # Check playlist name
-                playlist_name_lower = playlist.name.lower()
-                if similar_genre_name in playlist_name_lower:
-                    matches.append(playlist.id)
-        
-        return matches
+        similar_genres = self.genre_similarity_matrix.get(genre, ())
+        fields = self._prepare_playlists(playlists)
+        
+        # Similar genres can normalize to the same name (Deep House and House),
+        # so each distinct name is looked up once, then the id sets are merged
+        similar_names = dict.fromkeys(_GENRE_NORMALIZED[similar_genre] for similar_genre in similar_genres)
+        yield from frozenset().union(*(self._playlists_for_genre(fields, name) for name in similar_names))
     
     def _find_remix_specific_matches(self, track: TrackInfo, analysis: GenreAnalysis, 
-                                   playlists: List[PlaylistInfo]) -> List[str]:
+                                   playlists: List[PlaylistInfo]) -> Iterator[str]:
         """Find playlists specifically for remixes"""
-        matches = []
+        fields = self._prepare_playlists(playlists)
+        predicted_genre_name = _GENRE_NORMALIZED[analysis.predicted_genre]
         
-        for playlist in playlists:
-            playlist_name_lower = playlist.name.lower()
-            
-            # Look for remix-specific playlists
-            remix_keywords = ['remix', 'edit', 'version', 'mix', 'rework']
-            for keyword in remix_keywords:
-                if keyword in playlist_name_lower:
-                    # Check if the playlist genre matches the predicted genre
-                    playlist_genre = self._normalize_genre_name(playlist.genre)
-                    predicted_genre_name = self._normalize_genre_name(analysis.predicted_genre.value)
-                    
-                    if playlist_genre == predicted_genre_name or predicted_genre_name in playlist_name_lower:
-                        matches.append(playlist.id)
-                        break
-        
-        return matches
+        # Remix-specific playlists whose genre (tag or name) matches the predicted genre
+        yield from fields.remix_ids & self._playlists_for_genre(fields, predicted_genre_name)
     
     def _normalize_genre_name(self, genre_name: str) -> str:
         """Normalize genre name for comparison"""
-        if not genre_name:
-            return ""
-        
-        # Convert to lowercase and remove common variations
-        normalized = genre_name.lower().strip()
-        
-        # Handle common variations
-        variations = {
-            'drum and bass': 'drum & bass',
-            'dnb': 'drum & bass',
-            'd&b': 'drum & bass',
-            'progressive house': 'progressive',
-            'progressive trance': 'progressive',
-            'deep house': 'house',
-            'future bass': 'bass',
-            'trap': 'hip hop'
-        }
-        
-        return variations.get(normalized, normalized)
-    
-    def _build_genre_similarity_matrix(self) -> Dict[Genre, List[Genre]]:
-        """Build a matrix of similar genres for better matching"""
-        return {
-            Genre.HOUSE: [Genre.DEEP_HOUSE, Genre.PROGRESSIVE, Genre.TECHNO],
-            Genre.DEEP_HOUSE: [Genre.HOUSE, Genre.AMBIENT, Genre.DOWNTEMPO],
-            Genre.TECHNO: [Genre.HOUSE, Genre.INDUSTRIAL, Genre.EXPERIMENTAL],
-            Genre.TRANCE: [Genre.PROGRESSIVE, Genre.AMBIENT, Genre.ELECTRONIC],
-            Genre.DUBSTEP: [Genre.DRUM_AND_BASS, Genre.TRAP, Genre.FUTURE_BASS],
-            Genre.DRUM_AND_BASS: [Genre.DUBSTEP, Genre.BREAKBEAT, Genre.TECHNO],
-            Genre.BREAKBEAT: [Genre.DRUM_AND_BASS, Genre.TECHNO, Genre.EXPERIMENTAL],
-            Genre.AMBIENT: [Genre.DOWNTEMPO, Genre.DEEP_HOUSE, Genre.EXPERIMENTAL],
-            Genre.DOWNTEMPO: [Genre.AMBIENT, Genre.DEEP_HOUSE, Genre.CHILLOUT],
-            Genre.PROGRESSIVE: [Genre.TRANCE, Genre.HOUSE, Genre.ELECTRONIC],
-            Genre.FUTURE_BASS: [Genre.DUBSTEP, Genre.TRAP, Genre.ELECTRONIC],
-            Genre.TRAP: [Genre.HIP_HOP, Genre.DUBSTEP, Genre.FUTURE_BASS],
-            Genre.ELECTRONIC: [Genre.TECHNO, Genre.TRANCE, Genre.PROGRESSIVE],
-            Genre.EXPERIMENTAL: [Genre.AMBIENT, Genre.TECHNO, Genre.BREAKBEAT]
-        }
+        # Memoized: the same few playlist and enum genre names come up for every track
+        return _normalize_genre_name(genre_name)
     
     def create_playlist_suggestions(self, genre: Genre, existing_playlists: List[PlaylistInfo]) -> List[str]:
         """Create suggestions for new playlists based on genre"""
         suggestions = []
         
+        fields = self._prepare_playlists(existing_playlists)
+        
         # Check if we already have playlists for this genre
-        existing_genres = {self._normalize_genre_name(p.genre) for p in existing_playlists}
-        predicted_genre_name = self._normalize_genre_name(genre.value)
+        predicted_genre_name = _GENRE_NORMALIZED[genre]
         
-        if predicted_genre_name not in existing_genres:
+        if predicted_genre_name not in fields.by_genre:
             suggestions.append(f"{genre.value} Music")
         
         # Suggest remix playlists if we don't have them
-        has_remix_playlist = any('remix' in p.name.lower() for p in existing_playlists)
+        has_remix_playlist = bool(self._playlists_named_with(fields, 'remix'))
         if not has_remix_playlist:
             suggestions.append(f"{genre.value} Remixes")
         
         # Suggest sub-genre playlists
-        sub_genre_suggestions = {
-            Genre.HOUSE: ["Deep House", "Progressive House", "Tech House"],
-            Genre.TECHNO: ["Dark Techno", "Industrial Techno", "Minimal Techno"],
-            Genre.TRANCE: ["Uplifting Trance", "Progressive Trance", "Psy Trance"],
-            Genre.DUBSTEP: ["Brostep", "Chillstep", "Future Bass"],
-            Genre.DRUM_AND_BASS: ["Liquid DnB", "Neurofunk", "Jump Up"]
-        }
-        
-        if genre in sub_genre_suggestions:
-            for sub_genre in sub_genre_suggestions[genre]:
-                if not any(sub_genre.lower() in p.name.lower() for p in existing_playlists):
-                    suggestions.append(sub_genre)
+        for sub_genre in self._SUB_GENRE_SUGGESTIONS.get(genre, ()):
+            if not self._playlists_named_with(fields, sub_genre.casefold()):
+                suggestions.append(sub_genre)
         
         return suggestions
     
@@ -179,30 +265,25 @@ class PlaylistMatchingService:
             'recommendations': []
         }
         
-        # Count genre distribution
-        for playlist in playlists:
-            genre = self._normalize_genre_name(playlist.genre)
-            analysis['genre_distribution'][genre] = analysis['genre_distribution'].get(genre, 0) + 1
+        fields = self._prepare_playlists(playlists)
+        genre_counts = Counter()
         
-        # Find inconsistent playlists (name doesn't match genre)
-        for playlist in playlists:
-            playlist_name_lower = playlist.name.lower()
-            playlist_genre = self._normalize_genre_name(playlist.genre)
+        # Count genre distribution and find inconsistent playlists (name
+        # doesn't match genre) in one pass
+        for playlist, playlist_genre, genre_in_name in zip(playlists, fields.genres, fields.genre_in_name):
+            genre_counts[playlist_genre] += 1
             
-            if playlist_genre and playlist_genre not in playlist_name_lower:
+            if playlist_genre and not genre_in_name:
                 analysis['inconsistent_playlists'].append({
                     'name': playlist.name,
                     'genre': playlist.genre,
                     'issue': 'Genre tag does not match playlist name'
                 })
         
-        # Find missing genres
-        common_genres = ['house', 'techno', 'trance', 'dubstep', 'drum & bass', 'ambient']
-        existing_genres = set(analysis['genre_distribution'].keys())
+        analysis['genre_distribution'] = dict(genre_counts)
         
-        for genre in common_genres:
-            if genre not in existing_genres:
-                analysis['missing_genres'].append(genre)
+        # Find missing genres
+        analysis['missing_genres'] = [genre for genre in _COMMON_GENRES if genre not in genre_counts]
         
         # Generate recommendations
         if analysis['missing_genres']:
@@ -1,10 +1,32 @@
+import atexit
+import functools
 import os
 import logging
-from typing import Dict, Any
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Any, Optional
 from dotenv import load_dotenv
 
+# Writes queued log records to the console and log file off the calling thread
+_log_listener: Optional[QueueListener] = None
+
 def load_config() -> Dict[str, Any]:
-    """Load configuration from environment variables"""
+    """Load configuration from environment variables
+    
+    The environment is read once per process; each call returns a fresh copy
+    that callers may modify. ``reload_config()`` forces a re-read.
+    """
+    config = _load_config_cached()
+    return {key: list(value) if isinstance(value, list) else value for key, value in config.items()}
+
+def reload_config() -> Dict[str, Any]:
+    """Re-read the .env file and environment variables"""
+    _load_config_cached.cache_clear()
+    return load_config()
+
+@functools.lru_cache(maxsize=1)
+def _load_config_cached() -> Dict[str, Any]:
+    """Read configuration from environment variables"""
     # Load .env file if it exists
     load_dotenv()
     
@@ -12,24 +34,41 @@ def load_config() -> Dict[str, Any]:
         # Lexicon API Configuration
         'LEXICON_API_URL': os.getenv('LEXICON_API_URL', 'http://localhost:48624'),
         'LEXICON_API_VERSION': os.getenv('LEXICON_API_VERSION', 'v1'),
+        'LEXICON_ASYNC': os.getenv('LEXICON_ASYNC', 'false').lower() in ('1', 'true', 'yes'),
+        'LEXICON_WORKERS': int(os.getenv('LEXICON_WORKERS', '8')),
         
         # Last.fm API Configuration
         'LASTFM_API_KEY': os.getenv('LASTFM_API_KEY'),
+        'LASTFM_RATE_LIMIT': float(os.getenv('LASTFM_RATE_LIMIT', '5.0')),
         
         # MusicBrainz Configuration
         'MUSICBRAINZ_USER_AGENT': os.getenv('MUSICBRAINZ_USER_AGENT', 'GenreBendPro/1.0'),
+        'MUSICBRAINZ_RATE_LIMIT': float(os.getenv('MUSICBRAINZ_RATE_LIMIT', '1.0')),
+        'MUSICBRAINZ_SEARCH_LIMIT': int(os.getenv('MUSICBRAINZ_SEARCH_LIMIT', '5')),
+        
+        # Research Cache Settings
+        'RESEARCH_CACHE_DIR': os.path.expanduser(
+            os.getenv('RESEARCH_CACHE_DIR', '~/.cache/genrebend/research')
+        ),
+        'RESEARCH_CACHE_TTL_DAYS': float(os.getenv('RESEARCH_CACHE_TTL_DAYS', '30')),
         
         # Application Settings
         'BATCH_SIZE': int(os.getenv('BATCH_SIZE', '50')),
         'MAX_RETRIES': int(os.getenv('MAX_RETRIES', '3')),
         'RETRY_DELAY': float(os.getenv('RETRY_DELAY', '1.0')),
+        'RESEARCH_CONCURRENCY': int(os.getenv('RESEARCH_CONCURRENCY', '8')),
         'LOG_LEVEL': os.getenv('LOG_LEVEL', 'INFO'),
+        'KEEP_DETAILS': os.getenv('KEEP_DETAILS', 'false').lower() in ('1', 'true', 'yes'),
         
         # Audio Analysis Settings
         'AUDIO_SAMPLE_RATE': int(os.getenv('AUDIO_SAMPLE_RATE', '22050')),
         'AUDIO_DURATION_LIMIT': int(os.getenv('AUDIO_DURATION_LIMIT', '30')),
         'MFCC_FEATURES': int(os.getenv('MFCC_FEATURES', '13')),
         'CHROMA_FEATURES': int(os.getenv('CHROMA_FEATURES', '12')),
+        'AUDIO_COMPUTE_HPSS': os.getenv('AUDIO_COMPUTE_HPSS', 'false').lower() in ('1', 'true', 'yes'),
+        'FEATURE_CACHE_DIR': os.path.expanduser(
+            os.getenv('FEATURE_CACHE_DIR', '~/.cache/genrebend/features')
+        ),
         
         # Genre Classification Settings
         'CONFIDENCE_THRESHOLD': float(os.getenv('CONFIDENCE_THRESHOLD', '0.7')),
@@ -39,15 +78,57 @@ def load_config() -> Dict[str, Any]:
     return config
 
 def setup_logging(log_level: str = 'INFO'):
-    """Setup logging configuration"""
+    """Setup logging configuration
+    
+    Log calls only enqueue the record; a background listener formats it and
+    writes it to the console and the (rotated) log file.
+    """
+    global _log_listener
+    
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    stream_handler = logging.StreamHandler()
+    file_handler = RotatingFileHandler('genrebend-pro.log', maxBytes=10_000_000, backupCount=3)
+    for handler in (stream_handler, file_handler):
+        handler.setFormatter(formatter)
+    
+    previous_listener = _log_listener
+    
+    log_queue = queue.Queue(-1)
+    _log_listener = QueueListener(log_queue, stream_handler, file_handler)
+    _log_listener.start()
+    
+    # The listener's handlers do the formatting; the queue handler only
+    # renders the message (and any traceback) before enqueueing
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    
+    # force replaces the handler from an earlier call, whose queue the stopped
+    # listener no longer drains
     logging.basicConfig(
         level=getattr(logging, log_level.upper()),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler('genrebend-pro.log')
-        ]
+        handlers=[queue_handler],
+        force=True
     )
+    
+    # Only now nothing enqueues to the old listener; flush and close it
+    if previous_listener is not None:
+        _close_listener(previous_listener)
+
+def _close_listener(listener: QueueListener):
+    """Flush a listener's queued records and close its handlers"""
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+def _stop_log_listener():
+    """Flush queued log records before the interpreter exits"""
+    global _log_listener
+    
+    if _log_listener is not None:
+        _close_listener(_log_listener)
+        _log_listener = None
+
+atexit.register(_stop_log_listener)
 
 def validate_config(config: Dict[str, Any]) -> bool:
     """Validate that required configuration is present"""
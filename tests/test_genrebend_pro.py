@@ -4,6 +4,7 @@ Test suite for GenreBend Pro
 """
 
 import pytest
+import requests
 import sys
 import os
 from unittest.mock import Mock, patch
@@ -11,8 +12,14 @@ from unittest.mock import Mock, patch
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from src.models.track_models import TrackInfo, Genre, MusicResearchResult
+from src.models.track_models import TrackInfo, Genre, MusicResearchResult, PlaylistInfo, GenreAnalysis
 from src.services.music_research_service import MusicResearchService
+from src.services import genre_detection_service
+from src.services.lexicon_service import LexiconService
+from src.services import async_lexicon_service
+from src.services import music_organizer_service
+from src.services.playlist_matching_service import PlaylistMatchingService
+from src.utils import config as config_module
 
 
 class TestTrackModels:
@@ -102,6 +109,24 @@ class TestMusicResearchService:
         
         is_remix = self.service._detect_remix(track, lastfm_data, musicbrainz_data)
         assert is_remix is True
+        
+        # Keywords only count as whole words, so "Dublin" is not a dub
+        original = TrackInfo(id="test", title="Dublin Nights", artist="Edith")
+        assert self.service._detect_remix(original, None, None) is False
+        assert self.service._detect_remix(TrackInfo(id="test", title="Song - Radio Edit", artist="Artist"), None, None) is True
+    
+    def test_combine_genres(self):
+        """Test genre tags are gathered from every source without case duplicates"""
+        lastfm_data = {
+            "toptags": {"tag": [{"name": "House"}, {"name": "Deep House"}]},
+            "artist_info": {"tags": {"tag": {"name": "house"}}},
+            "similar_tracks": [{"toptags": {"tag": [{"name": "Techno"}, "bad tag"]}}]
+        }
+        musicbrainz_data = {"tag-list": [{"name": "techno", "count": "2"}]}
+        
+        genres = self.service._combine_genres(lastfm_data, musicbrainz_data)
+        assert genres == ["House", "Deep House", "Techno"]
+        assert self.service._combine_genres(None, None) == []
     
     def test_calculate_similarity(self):
         """Test string similarity calculation"""
@@ -116,12 +141,514 @@ class TestMusicResearchService:
         # Test partial match
         similarity = self.service._calculate_similarity("hello world", "hello there")
         assert 0 < similarity < 1
+    
+    def test_research_tracks_keeps_input_order(self):
+        """Test concurrent research returns one result per track, in order"""
+        tracks = [TrackInfo(id=str(i), title=f"Song {chr(97 + i)}", artist="Artist") for i in range(6)]
+        
+        def fake_track_info(track, artist, title):
+            # Only even tracks are known to Last.fm
+            return {'name': title} if int(track.id) % 2 == 0 else None
+        
+        with patch.object(self.service, "_get_lastfm_track_info", side_effect=fake_track_info), \
+             patch.object(self.service, "_get_lastfm_artist_info", return_value={'name': "artist"}) as mock_artist, \
+             patch.object(self.service, "_get_lastfm_similar_tracks", return_value=None) as mock_similar, \
+             patch.object(self.service, "_search_musicbrainz", return_value=None) as mock_musicbrainz:
+            results = self.service.research_tracks(tracks)
+        
+        assert [result.track_id for result in results] == [track.id for track in tracks]
+        assert results[0].lastfm_data == {'name': "song a", 'artist_info': {'name': "artist"}}
+        assert results[1].lastfm_data is None
+        
+        # Follow-up Last.fm lookups are only sent for tracks Last.fm knows
+        assert mock_artist.call_count == mock_similar.call_count == 3
+        assert mock_musicbrainz.call_count == 6
+    
+    @patch('src.services.music_research_service.time.sleep')
+    @patch('src.services.music_research_service.requests.Session.get')
+    def test_lastfm_get_honors_retry_after(self, mock_get, mock_sleep):
+        """Test throttled Last.fm requests are retried after Retry-After"""
+        throttled = Mock(status_code=429, headers={'Retry-After': '2'})
+        ok = Mock(status_code=200, headers={})
+        ok.json.return_value = {'artist': {'name': "Artist"}}
+        mock_get.side_effect = [throttled, ok]
+        
+        assert self.service._lastfm_get({'method': 'artist.getInfo'}) == {'artist': {'name': "Artist"}}
+        assert mock_get.call_count == 2
+        assert mock_sleep.call_args[0][0] == pytest.approx(2.0, abs=0.1)
+        assert self.service.throttle_ratio() == 0.5
+    
+    def test_lookups_are_cached_across_runs(self, tmp_path):
+        """Test found lookups are reused from disk by a new service instance"""
+        first_run = MusicResearchService("test_key", "TestAgent/1.0", cache_dir=str(tmp_path))
+        second_run = MusicResearchService("test_key", "TestAgent/1.0", cache_dir=str(tmp_path))
+        payload = {'artist': {'name': "Artist", 'tags': {'tag': [{'name': "house"}]}}}
+        
+        with patch.object(MusicResearchService, "_lastfm_get", return_value=payload) as mock_get:
+            assert first_run._get_lastfm_artist_info("artist") == payload['artist']
+            assert first_run._get_lastfm_artist_info("artist") == payload['artist']
+            assert second_run._get_lastfm_artist_info("artist") == payload['artist']
+        
+        assert mock_get.call_count == 1
+    
+    def test_zero_rate_limits_mean_unlimited(self):
+        """Test a rate limit of 0 disables pacing instead of failing"""
+        with patch('src.services.music_research_service.musicbrainzngs.set_rate_limit') as mock_set_rate_limit:
+            service = MusicResearchService("test_key", "TestAgent/1.0",
+                                           lastfm_rate_limit=0, musicbrainz_rate_limit=0)
+        
+        mock_set_rate_limit.assert_called_once_with(False)
+        assert service._lastfm_limiter.interval == 0.0
+    
+    def test_memory_lookup_cache_is_bounded(self):
+        """Test the in-memory lookup cache evicts the least recently used entries"""
+        service = MusicResearchService("test_key", "TestAgent/1.0", memory_cache_size=2)
+        fetches = []
+        
+        def lookup(name):
+            return service._cached_lookup('artist.getInfo', (name,), lambda: fetches.append(name) or name)
+        
+        for name in ("a", "b", "a", "c", "a", "b"):
+            assert lookup(name) == name
+        
+        assert fetches == ["a", "b", "c", "b"]
+        assert len(service._lookup_cache) == 2
+
+
+class TestGenreDetectionService:
+    """Test GenreDetectionService"""
+    
+    def test_existing_files_keeps_paths_as_given(self, tmp_path):
+        """Test unnormalized and differently cased paths are still found"""
+        (tmp_path / "Track.mp3").write_bytes(b"")
+        exact = str(tmp_path / "Track.mp3")
+        doubled = f"{tmp_path}//Track.mp3"
+        dotted = os.path.join(str(tmp_path), ".", "Track.mp3")
+        other_case = str(tmp_path / "track.MP3")
+        missing = str(tmp_path / "Missing.mp3")
+        
+        real_isfile = os.path.isfile
+        def case_insensitive_isfile(path):
+            return real_isfile(path) or path.lower() == exact.lower()
+        
+        with patch.object(genre_detection_service.os.path, "isfile",
+                          side_effect=case_insensitive_isfile) as mock_isfile:
+            found = genre_detection_service.existing_files([exact, doubled, dotted, other_case, missing])
+        
+        assert found == {exact, doubled, dotted, other_case}
+        # Only the name the listing spells differently needs a stat
+        mock_isfile.assert_called_once_with(other_case)
+    
+    @staticmethod
+    def _training_data(genres, repeats=10, feature_order=genre_detection_service.AUDIO_FEATURE_ORDER):
+        """Build separable training samples using the audio feature schema"""
+        data = []
+        for i, genre in enumerate(genres * repeats):
+            features = dict.fromkeys(feature_order, 0.5)
+            features["tempo"] = 120.0 + genres.index(genre) * 10
+            data.append((features, genre))
+        return data
+    
+    def test_audio_features_are_cached(self, tmp_path):
+        """Test extracted features are reused for an unchanged file"""
+        audio_file = tmp_path / "song.wav"
+        audio_file.write_bytes(b"audio")
+        cache_dir = str(tmp_path / "cache")
+        features = {"spectral_centroid": 1.0, "tempo": 120.0}
+        
+        with patch.object(genre_detection_service, "_compute_audio_features",
+                          return_value=features) as mock_compute:
+            first = genre_detection_service.extract_audio_features(
+                str(audio_file), cache_dir=cache_dir
+            )
+            second = genre_detection_service.extract_audio_features(
+                str(audio_file), cache_dir=cache_dir
+            )
+        
+        assert mock_compute.call_count == 1
+        assert first == second == features
+        assert list(second) == list(features)
+    
+    def test_batch_prediction_matches_single(self):
+        """Test batched audio prediction agrees with per-track prediction"""
+        service = genre_detection_service.GenreDetectionService()
+        training_data = self._training_data(["house", "techno", "trance"])
+        assert service.train_model(training_data)
+        
+        feature_dicts = [features for features, _ in training_data[:6]]
+        batched = service._predict_from_audio_batch(feature_dicts)
+        
+        assert batched == [service._predict_from_audio(features) for features in feature_dicts]
+        assert all(genre != Genre.UNKNOWN for genre, _ in batched)
+    
+    def test_model_save_load_roundtrip(self, tmp_path):
+        """Test saved models load back, including legacy pickle files"""
+        import pickle
+        
+        service = genre_detection_service.GenreDetectionService()
+        training_data = self._training_data(["house", "techno"])
+        assert service.train_model(training_data)
+        features = training_data[0][0]
+        
+        model_path = tmp_path / "model.joblib"
+        assert service.save_model(str(model_path))
+        loaded = genre_detection_service.GenreDetectionService()
+        assert loaded.load_model(str(model_path))
+        assert loaded._predict_from_audio(features) == service._predict_from_audio(features)
+        
+        legacy_path = tmp_path / "model.pkl"
+        with open(legacy_path, "wb") as f:
+            pickle.dump({"model": service.model, "scaler": service.scaler, "is_trained": True}, f)
+        legacy = genre_detection_service.GenreDetectionService()
+        assert legacy.load_model(str(legacy_path))
+        assert legacy.compute_hpss
+        assert legacy._predict_from_audio(features) == service._predict_from_audio(features)
+    
+    def test_models_keep_their_harmonic_feature(self, tmp_path):
+        """Test the spectral_tonality estimate never stands in for harmonic_ratio"""
+        service = genre_detection_service.GenreDetectionService(compute_hpss=True)
+        training_data = self._training_data(
+            ["house", "techno"], feature_order=genre_detection_service.TONALITY_FEATURE_ORDER
+        )
+        assert service.train_model(training_data)
+        assert not service.compute_hpss
+        
+        model_path = tmp_path / "model.joblib"
+        assert service.save_model(str(model_path))
+        loaded = genre_detection_service.GenreDetectionService(compute_hpss=True)
+        assert loaded.load_model(str(model_path))
+        assert loaded.feature_order == genre_detection_service.TONALITY_FEATURE_ORDER
+        
+        # Features extracted for the other layout aren't fed to the model
+        hpss_features = self._training_data(["house"])[0][0]
+        assert loaded._predict_from_audio(hpss_features) == (Genre.UNKNOWN, 0.0)
+    
+    def test_prediction_ignores_feature_dict_order(self):
+        """Test features are laid out by schema, not dict insertion order"""
+        service = genre_detection_service.GenreDetectionService()
+        assert service.train_model(self._training_data(["house", "techno"]))
+        
+        features = self._training_data(["house", "techno"])[1][0]
+        reordered = dict(reversed(list(features.items())))
+        
+        assert service._predict_from_audio(reordered) == service._predict_from_audio(features)
+        assert not service.train_model([({"tempo": 120.0}, "house")])
+    
+    def test_audio_pool_is_kept_for_the_session(self):
+        """Test one spawned worker pool serves every batch until closed"""
+        from concurrent.futures import Future
+        
+        def submit(fn, *args):
+            future = Future()
+            future.set_result({"tempo": 120.0})
+            return future
+        
+        service = genre_detection_service.GenreDetectionService()
+        with patch.object(genre_detection_service, "ProcessPoolExecutor") as mock_pool:
+            mock_pool.return_value.submit.side_effect = submit
+            for batch in (["a.wav", "b.wav"], ["c.wav", "d.wav"]):
+                features = service._extract_batch_features(batch, max_workers=2)
+                assert features == dict.fromkeys(batch, {"tempo": 120.0})
+            
+            assert mock_pool.call_count == 1
+            assert mock_pool.call_args.kwargs["mp_context"].get_start_method() == "spawn"
+            
+            service.close()
+            mock_pool.return_value.shutdown.assert_called_once()
+            assert service._executor is None
+    
+    def test_audio_worker_errors_reach_the_parent_log(self, tmp_path, caplog):
+        """Test records logged in worker processes go through this process's handlers"""
+        missing = [str(tmp_path / "first.wav"), str(tmp_path / "second.wav")]
+        service = genre_detection_service.GenreDetectionService()
+        
+        with caplog.at_level("ERROR", logger=genre_detection_service.__name__):
+            try:
+                features = service._extract_batch_features(missing, max_workers=2)
+            finally:
+                service.close()
+        
+        assert features == dict.fromkeys(missing, {})
+        logged = [record.getMessage() for record in caplog.records]
+        for file_path in missing:
+            assert any(f"Failed to extract audio features from {file_path}" in message for message in logged)
+
+
+class TestLexiconService:
+    """Test LexiconService"""
+    
+    def test_get_all_tracks_concurrent_pages_in_order(self):
+        """Test concurrently fetched pages are stitched back together in order"""
+        total = 1234
+        requested_offsets = []
+        
+        def fake_get_tracks(limit=100, offset=0):
+            requested_offsets.append(offset)
+            return list(range(offset, min(offset + limit, total)))
+        
+        service = LexiconService()
+        with patch.object(service, "get_tracks", side_effect=fake_get_tracks):
+            tracks = service.get_all_tracks(limit=100, max_workers=4)
+        
+        assert tracks == list(range(total))
+        assert max(requested_offsets) < total + 4 * 100
+    
+    def test_iter_tracks_only_fetches_ahead_of_the_consumer(self):
+        """Test streaming tracks requests pages a bounded window ahead"""
+        requested_offsets = []
+        
+        def fake_get_tracks(limit=100, offset=0):
+            requested_offsets.append(offset)
+            return list(range(offset, offset + limit))  # effectively endless library
+        
+        service = LexiconService()
+        with patch.object(service, "get_tracks", side_effect=fake_get_tracks):
+            tracks = service.iter_tracks(limit=10, max_workers=3)
+            assert [next(tracks) for _ in range(25)] == list(range(25))
+            tracks.close()
+        
+        assert max(requested_offsets) <= 50
+    
+    def test_bulk_playlist_adds_need_confirmation(self):
+        """Test bulk additions only count confirmed tracks and are never blindly resent"""
+        def response(status, payload=None):
+            mock_response = Mock(status_code=status, content=b'{}' if payload is not None else b'')
+            mock_response.json.return_value = payload
+            if status >= 400:
+                error = requests.exceptions.HTTPError(f"{status} error", response=mock_response)
+                mock_response.raise_for_status.side_effect = error
+            return mock_response
+        
+        def added(results):
+            return all(results.values()) and list(results) == ["t1", "t2"]
+        
+        service = LexiconService()
+        with patch.object(service.session, "request") as mock_request:
+            # Bulk field ignored: the playlist shows nothing was added, so each
+            # track is added individually and bulk is switched off
+            mock_request.side_effect = [response(200, {}), response(200, {'tracks': []}),
+                                        response(200, {}), response(200, {})]
+            assert added(service.add_tracks_to_playlist("p1", ["t1", "t2"]))
+            assert mock_request.call_count == 4
+            assert service._bulk_playlist_adds_supported is False
+            
+            # An unlisted success the playlist confirms is not sent again
+            service._bulk_playlist_adds_supported = None
+            mock_request.reset_mock()
+            mock_request.side_effect = [response(200, {}),
+                                        response(200, {'tracks': [{'id': "t1"}, {'id': "t2"}]})]
+            assert added(service.add_tracks_to_playlist("p1", ["t1", "t2"]))
+            assert mock_request.call_count == 2
+            assert service._bulk_playlist_adds_supported is True
+            
+            # Without a way to check, it is trusted and bulk is switched off
+            service._bulk_playlist_adds_supported = None
+            mock_request.reset_mock()
+            mock_request.side_effect = [response(200, {}), response(500)]
+            assert added(service.add_tracks_to_playlist("p1", ["t1", "t2"]))
+            assert mock_request.call_count == 2
+            assert service._bulk_playlist_adds_supported is False
+            
+            service._bulk_playlist_adds_supported = None
+            
+            # A transient failure doesn't switch bulk off
+            mock_request.side_effect = [response(500), response(200, {}), response(200, {})]
+            assert added(service.add_tracks_to_playlist("p1", ["t1", "t2"]))
+            assert service._bulk_playlist_adds_supported is None
+            
+            # A partly confirmed bulk add only adds the rest individually
+            mock_request.reset_mock()
+            mock_request.side_effect = [response(200, {'trackIds': ["t1"]}), response(200, {})]
+            assert added(service.add_tracks_to_playlist("p1", ["t1", "t2"]))
+            assert mock_request.call_args.kwargs['json'] == {'trackId': "t2"}
+            assert service._bulk_playlist_adds_supported is True
+            
+            # A definitive 404 does
+            service._bulk_playlist_adds_supported = None
+            mock_request.side_effect = [response(404), response(200, {}), response(200, {})]
+            assert added(service.add_tracks_to_playlist("p1", ["t1", "t2"]))
+            assert service._bulk_playlist_adds_supported is False
+    
+    def test_unconfirmed_bulk_updates_stop_bulk(self):
+        """Test a bulk update that reports no tracks is resent individually once"""
+        success = Mock(status_code=200, content=b'{}')
+        success.json.return_value = {}
+        service = LexiconService()
+        
+        with patch.object(service.session, "request", return_value=success) as mock_request:
+            updates = [("t1", {'genre': "House"}), ("t2", {'genre': "Techno"})]
+            assert service.bulk_update_tracks(updates) == {"t1": True, "t2": True}
+            assert mock_request.call_count == 3
+            assert service._bulk_updates_supported is False
+            
+            mock_request.reset_mock()
+            assert service.bulk_update_tracks(updates) == {"t1": True, "t2": True}
+            assert mock_request.call_count == 2
+    
+    def test_async_writes_survive_bad_responses(self):
+        """Test a malformed or failed response only fails its own request"""
+        httpx = pytest.importorskip("httpx")
+        from functools import partial
+        
+        def handler(request):
+            if request.url.path.endswith("/bad-json"):
+                return httpx.Response(200, content=b"not json")
+            if request.url.path.endswith("/error"):
+                return httpx.Response(500)
+            return httpx.Response(200, json={})
+        
+        service = async_lexicon_service.AsyncLexiconService()
+        client = partial(httpx.AsyncClient, transport=httpx.MockTransport(handler))
+        with patch.object(async_lexicon_service.httpx, "AsyncClient", client):
+            results = service._send_each([
+                ('PUT', 'tracks/ok', {}), ('PUT', 'tracks/bad-json', {}),
+                ('PUT', 'tracks/error', {}), ('PUT', 'tracks/ok-again', {}),
+            ])
+        
+        assert results == [True, False, False, True]
+
+
+class TestMusicOrganizerService:
+    """Test MusicOrganizerService"""
+    
+    def test_collection_stats_match_between_loop_and_pandas(self):
+        """Test the pandas path for large libraries counts like the plain loop"""
+        organizer = music_organizer_service.MusicOrganizerService({'CONFIDENCE_THRESHOLD': 0.7})
+        genres = ["House", "Techno", None, "", "House"]
+        scores = [0.9, 0.5, None, 0.0, 0.2]
+        tracks = [
+            TrackInfo(id=str(i), title="t", artist="a", current_genre=genres[i % 5], confidence_score=scores[i % 5])
+            for i in range(50)
+        ]
+        
+        looped = organizer._collection_genre_stats(tracks)
+        with patch.object(music_organizer_service, "VECTORIZED_ANALYSIS_MIN_TRACKS", 1):
+            vectorized = organizer._collection_genre_stats(tracks)
+        
+        assert looped == vectorized == ({"House": 20, "Techno": 10}, 20, 20)
+    
+    def test_process_batch_advances_progress_per_track(self):
+        """Test every processed or failed track advances the run's progress bar"""
+        organizer = music_organizer_service.MusicOrganizerService({'CONFIDENCE_THRESHOLD': 0.7})
+        tracks = [TrackInfo(id=str(i), title="t", artist="a") for i in range(3)]
+        outcomes = [
+            {'success': True, 'updated': False, 'playlist_additions': 0, 'skipped': True},
+            RuntimeError("boom"),
+            {'success': True, 'updated': False, 'playlist_additions': 0, 'skipped': True},
+        ]
+        progress = Mock()
+        
+        with patch.object(organizer, "_analyze_batch", return_value={}), \
+             patch.object(organizer, "_process_single_track", side_effect=outcomes), \
+             patch.object(organizer, "_apply_pending_writes"):
+            results = organizer._process_batch(tracks, [], dry_run=True, progress=progress)
+        
+        assert progress.update.call_count == 3
+        assert results['errors'] == 1
+    
+    def test_confident_tracks_are_skipped_before_batching(self):
+        """Test tracks with a confident genre are counted as skipped and never researched"""
+        organizer = music_organizer_service.MusicOrganizerService({'CONFIDENCE_THRESHOLD': 0.7})
+        tracks = [
+            TrackInfo(id="1", title="t", artist="a", current_genre="House", confidence_score=0.9),
+            TrackInfo(id="2", title="t", artist="a", current_genre="House", confidence_score=0.5),
+        ]
+        results = organizer._new_totals()
+        
+        with patch.object(organizer.music_research_service, "research_tracks",
+                          return_value=[MusicResearchResult(track_id="2")]) as mock_research:
+            pending = list(organizer._tracks_needing_work(tracks, results))
+            organizer._analyze_batch(pending)
+        
+        assert [track.id for track in pending] == ["2"]
+        assert mock_research.call_args[0][0] == pending
+        assert results['processed'] == results['skipped'] == 1
+
+
+class TestPlaylistMatchingService:
+    """Test PlaylistMatchingService"""
+    
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.service = PlaylistMatchingService()
+        self.playlists = [
+            PlaylistInfo(id="p1", name="Friday House", genre="House"),
+            PlaylistInfo(id="p2", name="Deep Cuts", genre="Deep House"),
+            PlaylistInfo(id="p3", name="Techno Remixes", genre="Techno"),
+            PlaylistInfo(id="p4", name="Liquid DnB", genre="dnb"),
+            PlaylistInfo(id="p5", name="House Edits", genre=""),
+        ]
+    
+    def test_match_track_to_playlists(self):
+        """Test direct, similar and remix playlist matches"""
+        track = TrackInfo(id="t1", title="Song (Club Mix)", artist="Artist")
+        analysis = GenreAnalysis(track_id="t1", predicted_genre=Genre.HOUSE, confidence=0.9,
+                                 is_remix=True, analysis_method="metadata")
+        
+        matches = self.service.match_track_to_playlists(track, analysis, self.playlists)
+        
+        assert matches == ["p1", "p2", "p3", "p5"]
+    
+    def test_playlist_fields_follow_the_list(self):
+        """Test normalized fields are reused for unchanged playlists and rebuilt on any change"""
+        fields = self.service._prepare_playlists(self.playlists)
+        assert fields.genres == ("house", "house", "techno", "drum & bass", "")
+        assert self.service._prepare_playlists(self.playlists) is fields
+        assert self.service._prepare_playlists(list(self.playlists)) is fields
+        
+        self.playlists.append(PlaylistInfo(id="p6", name="Trance", genre="Trance"))
+        assert self.service._prepare_playlists(self.playlists).ids[-1] == "p6"
+        assert self.service._prepare_playlists(self.playlists[:1]).ids == ("p1",)
+        
+        # Edited in place, same list and length
+        self.playlists[0] = PlaylistInfo(id="p9", name="Friday House", genre="House")
+        self.playlists[1].genre = "Techno"
+        fields = self.service._prepare_playlists(self.playlists)
+        assert fields.ids[0] == "p9"
+        assert fields.genres[1] == "techno"
+
+
+class TestConfig:
+    """Test configuration loading"""
+    
+    def test_load_config_reads_environment_once(self, monkeypatch):
+        """Test load_config caches the environment but hands out separate copies"""
+        monkeypatch.setenv('BATCH_SIZE', '25')
+        config = config_module.reload_config()
+        assert config['BATCH_SIZE'] == 25
+        
+        monkeypatch.setenv('BATCH_SIZE', '75')
+        config['REMIX_KEYWORDS'].append('changed')
+        again = config_module.load_config()
+        assert again['BATCH_SIZE'] == 25
+        assert 'changed' not in again['REMIX_KEYWORDS']
+        
+        assert config_module.reload_config()['BATCH_SIZE'] == 75
+        config_module._load_config_cached.cache_clear()
+    
+    def test_setup_logging_twice_keeps_logging(self, tmp_path, monkeypatch):
+        """Test a second setup_logging call still delivers records to the log file"""
+        import logging
+        monkeypatch.chdir(tmp_path)
+        root_handlers = logging.root.handlers[:]
+        try:
+            config_module.setup_logging('INFO')
+            config_module.setup_logging('INFO')
+            logging.getLogger('genrebend.test').info('after second setup')
+            config_module._stop_log_listener()
+        finally:
+            for handler in logging.root.handlers[:]:
+                logging.root.removeHandler(handler)
+            for handler in root_handlers:
+                logging.root.addHandler(handler)
+        
+        assert 'after second setup' in (tmp_path / 'genrebend-pro.log').read_text()
 
 
 class TestIntegration:
     """Integration tests"""
     
-    @patch('src.services.music_research_service.requests.get')
+    @patch('src.services.music_research_service.requests.Session.get')
     def test_lastfm_search_mock(self, mock_get):
         """Test Last.fm search with mocked response"""
         # Mock response